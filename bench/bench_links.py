@@ -0,0 +1,50 @@
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from parse_markdown import split_nodes_image, split_nodes_link
+from textnode import TextNode, TextType
+
+SIZES = [625, 1250, 2500, 5000, 10000]
+
+
+def link_paragraph(count: int) -> str:
+    return ' '.join(f'see [page {index}](/pages/{index}.html) and' for index in range(count))
+
+
+def image_paragraph(count: int) -> str:
+    return ' '.join(f'look ![figure {index}](/img/{index}.png) here' for index in range(count))
+
+
+def time_split(split, text: str) -> float:
+    nodes = [TextNode(text, TextType.TEXT)]
+    timer = timeit.Timer(lambda: split(nodes))
+    loops, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=loops)) / loops
+
+
+def main() -> int:
+    linear = True
+    for name, split, make_text in (
+            ('split_nodes_link', split_nodes_link, link_paragraph),
+            ('split_nodes_image', split_nodes_image, image_paragraph)):
+        print(name)
+        previous = None
+        for size in SIZES:
+            seconds = time_split(split, make_text(size))
+            growth = '' if previous is None else f'  x{seconds / previous:.2f}'
+            print(f'  {size:>6} matches  {seconds * 1000:8.3f} ms  {seconds / size * 1e6:6.3f} us/match{growth}')
+            previous = seconds
+        first = time_split(split, make_text(SIZES[0]))
+        last = time_split(split, make_text(SIZES[-1]))
+        # 16x more matches should cost about 16x the time; quadratic rescanning would cost ~256x
+        if last / first > 2 * SIZES[-1] / SIZES[0]:
+            print(f'  not linear: x{last / first:.1f} for x{SIZES[-1] // SIZES[0]} matches')
+            linear = False
+    return 0 if linear else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
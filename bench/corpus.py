@@ -0,0 +1,104 @@
+import os
+import random
+from typing import Callable, Dict
+
+
+def paragraph(rng: random.Random, words: int) -> str:
+    parts = []
+    for index in range(words):
+        roll = rng.random()
+        if roll < 0.05:
+            parts.append(f'**bold {index}**')
+        elif roll < 0.10:
+            parts.append(f'*italic {index}*')
+        elif roll < 0.13:
+            parts.append(f'`code {index}`')
+        elif roll < 0.15:
+            parts.append(f'[link {index}](/pages/{index}.html)')
+        else:
+            parts.append(rng.choice(['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'static', 'site', 'page']))
+    return ' '.join(parts)
+
+
+def quote_line(rng: random.Random, words: int) -> str:
+    # the quote renderer joins lines without a separator, so a line must neither start nor
+    # end in an inline delimiter or '*a* ' + '*b*' would turn into an unbalanced '*a**b*'
+    return f'> {rng.choice(["she", "he", "they"])} {paragraph(rng, words)} said'
+
+
+def link_heavy(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    blocks = ['# Link heavy']
+    while sum(map(len, blocks)) < size:
+        blocks.append(' '.join(
+            f'[page {rng.randrange(100_000)}](/pages/{rng.randrange(100_000)}.html) and '
+            f'![figure](/img/{rng.randrange(1000)}.png)'
+            for _ in range(50)))
+    return '\n\n'.join(blocks)
+
+
+def list_heavy(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    blocks = ['# List heavy']
+    while sum(map(len, blocks)) < size:
+        if rng.random() < 0.5:
+            blocks.append('\n'.join(f'- {paragraph(rng, 8)}' for _ in range(20)))
+        else:
+            blocks.append('\n'.join(f'{index + 1}. {paragraph(rng, 8)}' for index in range(20)))
+    return '\n\n'.join(blocks)
+
+
+def code_heavy(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    blocks = ['# Code heavy']
+    while sum(map(len, blocks)) < size:
+        lines = [f'    value_{index} = compute({rng.randrange(1000)}) * 2' for index in range(30)]
+        blocks.append('```\ndef example():\n' + '\n'.join(lines) + '\n```')
+        blocks.append(paragraph(rng, 20))
+    return '\n\n'.join(blocks)
+
+
+def huge_paragraph(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = []
+    length = 0
+    while length < size:
+        word = paragraph(rng, 1)
+        words.append(word)
+        length += len(word) + 1
+    return '# Huge paragraph\n\n' + ' '.join(words)
+
+
+def mixed(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    blocks = ['# Mixed']
+    while sum(map(len, blocks)) < size:
+        roll = rng.random()
+        if roll < 0.1:
+            blocks.append(f'## Section {len(blocks)}')
+        elif roll < 0.2:
+            blocks.append('\n'.join(quote_line(rng, 10) for _ in range(3)))
+        elif roll < 0.3:
+            blocks.append('\n'.join(f'* {paragraph(rng, 6)}' for _ in range(5)))
+        elif roll < 0.35:
+            blocks.append('```\nprint("hello")\n```')
+        else:
+            blocks.append(paragraph(rng, 60))
+    return '\n\n'.join(blocks)
+
+
+DOCUMENTS: Dict[str, Callable[[int, int], str]] = {
+    'link_heavy': link_heavy,
+    'list_heavy': list_heavy,
+    'code_heavy': code_heavy,
+    'huge_paragraph': huge_paragraph,
+    'mixed': mixed,
+}
+
+
+def write_tree(root: str, pages: int, page_size: int = 2000, fan_out: int = 20, seed: int = 0) -> None:
+    for index in range(pages):
+        dir_path = os.path.join(root, f'section{index // fan_out}')
+        os.makedirs(dir_path, exist_ok=True)
+        with open(os.path.join(dir_path, f'page{index}.md'), 'w') as file:
+            file.write(mixed(page_size, seed + index))
@@ -0,0 +1,156 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from corpus import DOCUMENTS, write_tree
+from handle_files import generate_page_recursive
+from parse_markdown import markdown_to_blocks, markdown_to_html, markdown_to_html_node, text_to_textnodes
+
+LINE_MARKER_PATTERN = re.compile(r'^(#+ |> ?|[-*] |\d+\. )')
+
+TEMPLATE = '<!DOCTYPE html>\n<html>\n<head><title>{{ Title }}</title></head>\n<body>{{ Content }}</body>\n</html>\n'
+
+
+def best_time(function: Callable[[], object], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def peak_memory(function: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_document(markdown: str, repeat: int) -> Dict[str, dict]:
+    size = len(markdown.encode())
+    blocks = markdown_to_blocks(markdown)
+    # inline text of every non-code block, with heading, quote and list markers removed
+    inline_texts = [
+        LINE_MARKER_PATTERN.sub('', line)
+        for block in blocks if not block.startswith('```')
+        for line in block.split('\n')
+    ]
+    node = markdown_to_html_node(markdown)
+
+    stages = {
+        'text_to_textnodes': lambda: [text_to_textnodes(text) for text in inline_texts],
+        'markdown_to_blocks': lambda: markdown_to_blocks(markdown),
+        'markdown_to_html_node': lambda: markdown_to_html_node(markdown),
+        'to_html': node.to_html,
+        'markdown_to_html': lambda: markdown_to_html(markdown),
+    }
+    results = {}
+    for name, function in stages.items():
+        seconds = best_time(function, repeat)
+        results[name] = {'seconds': seconds, 'mb_per_s': size / seconds / 1e6}
+    results['peak_memory'] = {'bytes': peak_memory(lambda: markdown_to_html_node(markdown).to_html())}
+    return results
+
+
+def bench_tree(pages: int, repeat: int) -> Dict[str, dict]:
+    with tempfile.TemporaryDirectory() as tmp:
+        content = os.path.join(tmp, 'content')
+        template = os.path.join(tmp, 'template.html')
+        write_tree(content, pages)
+        with open(template, 'w') as file:
+            file.write(TEMPLATE)
+
+        def build():
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_page_recursive(content, template, os.path.join(tmp, 'public'))
+
+        seconds = best_time(build, repeat)
+    return {'generate_page_recursive': {'seconds': seconds, 'pages_per_s': pages / seconds}}
+
+
+def run(size: int, pages: int, repeat: int) -> Dict[str, Dict[str, dict]]:
+    results = {}
+    for name, generate in DOCUMENTS.items():
+        results[name] = bench_document(generate(size, 0), repeat)
+    results[f'tree_{pages}_pages'] = bench_tree(pages, repeat)
+    return results
+
+
+def print_report(results: Dict[str, Dict[str, dict]], baseline: Dict[str, Dict[str, dict]]) -> None:
+    print(f'{"corpus":<18} {"stage":<24} {"time":>10} {"throughput":>14} {"vs baseline":>12}')
+    for corpus, stages in results.items():
+        for stage, result in stages.items():
+            if 'seconds' in result:
+                time_text = f'{result["seconds"] * 1000:8.2f}ms'
+            else:
+                time_text = f'{result["bytes"] / 1e6:8.2f}MB'
+            if 'mb_per_s' in result:
+                throughput = f'{result["mb_per_s"]:8.2f} MB/s'
+            elif 'pages_per_s' in result:
+                throughput = f'{result["pages_per_s"]:7.0f} pages/s'
+            else:
+                throughput = 'peak'
+            previous = baseline.get(corpus, {}).get(stage)
+            change = ''
+            if previous is not None:
+                metric = 'seconds' if 'seconds' in result else 'bytes'
+                change = f'{(result[metric] / previous[metric] - 1) * 100:+.1f}%'
+            print(f'{corpus:<18} {stage:<24} {time_text:>10} {throughput:>14} {change:>12}')
+
+
+def regressions(results: Dict[str, Dict[str, dict]], baseline: Dict[str, Dict[str, dict]], tolerance: float) -> list:
+    found = []
+    for corpus, stages in baseline.items():
+        for stage, previous in stages.items():
+            current = results.get(corpus, {}).get(stage)
+            if current is None:
+                continue
+            metric = 'seconds' if 'seconds' in previous else 'bytes'
+            if current[metric] > previous[metric] * (1 + tolerance):
+                found.append(f'{corpus}/{stage}: {previous[metric]:.4g} -> {current[metric]:.4g} {metric}')
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the markdown to HTML pipeline.')
+    parser.add_argument('--size', type=int, default=200_000, help='approximate size of each document in bytes')
+    parser.add_argument('--pages', type=int, default=200, help='number of pages in the generated content tree')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per stage, the fastest one is reported')
+    parser.add_argument('--save', metavar='PATH', help='write the results to a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH', help='compare against a saved JSON baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before failing a comparison')
+    args = parser.parse_args()
+
+    results = run(args.size, args.pages, args.repeat)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    print_report(results, baseline)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    found = regressions(results, baseline, args.tolerance)
+    for regression in found:
+        print(f'regression: {regression}')
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
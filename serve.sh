@@ -0,0 +1 @@
+python3 src/dev_server.py
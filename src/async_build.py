@@ -0,0 +1,108 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from handle_files import BuildError, collect_pages, generate_page_streaming, is_large_page, read_markdown, \
+    render_page_parts, write_page
+
+
+async def generate_pages_async(
+        pages: List[Tuple[str, str]],
+        template_path: str,
+        jobs: int = 1,
+        io_workers: int = 8,
+        queue_size: int = 32,
+        minify: bool = False
+) -> None:
+    # Readers fill a bounded queue ahead of the renderers, renderers run in an executor and
+    # writers drain a second bounded queue, so reading, rendering and writing overlap while
+    # at most 2 * queue_size pages are held in memory.
+    loop = asyncio.get_running_loop()
+    read_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    write_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    errors: Dict[str, Exception] = {}
+    plan = iter(pages)
+
+    render_executor: Executor
+    if jobs > 1:
+        render_executor = ProcessPoolExecutor(max_workers=jobs)
+    else:
+        render_executor = ThreadPoolExecutor(max_workers=1)
+
+    async def read_worker() -> None:
+        for content_path, destination_path in plan:
+            try:
+                if await loop.run_in_executor(io_executor, is_large_page, content_path):
+                    # left to the renderer, which streams it from disk like the serial build
+                    markdown = None
+                else:
+                    markdown = await loop.run_in_executor(io_executor, read_markdown, content_path)
+            except Exception as error:
+                errors[content_path] = error
+                continue
+            await read_queue.put((content_path, destination_path, markdown))
+
+    async def render_worker() -> None:
+        while (item := await read_queue.get()) is not None:
+            content_path, destination_path, markdown = item
+            if markdown is None:
+                try:
+                    await loop.run_in_executor(
+                        render_executor, generate_page_streaming, content_path, template_path, destination_path, minify)
+                except Exception as error:
+                    errors[content_path] = error
+                continue
+            try:
+                parts = await loop.run_in_executor(
+                    render_executor, render_page_parts, markdown, template_path, None, minify)
+            except Exception as error:
+                errors[content_path] = error
+                continue
+            await write_queue.put((content_path, destination_path, parts))
+
+    async def write_worker() -> None:
+        while (item := await write_queue.get()) is not None:
+            content_path, destination_path, parts = item
+            try:
+                await loop.run_in_executor(io_executor, write_page, destination_path, parts)
+            except Exception as error:
+                errors[content_path] = error
+
+    with ThreadPoolExecutor(max_workers=io_workers) as io_executor, render_executor:
+        readers = [asyncio.create_task(read_worker()) for _ in range(io_workers)]
+        renderers = [asyncio.create_task(render_worker()) for _ in range(max(jobs, 1))]
+        writers = [asyncio.create_task(write_worker()) for _ in range(io_workers)]
+
+        await asyncio.gather(*readers)
+        for _ in renderers:
+            await read_queue.put(None)
+        await asyncio.gather(*renderers)
+        for _ in writers:
+            await write_queue.put(None)
+        await asyncio.gather(*writers)
+
+    if errors:
+        # report failures in plan order, not completion order
+        raise BuildError({
+            content_path: errors[content_path]
+            for content_path, _ in pages
+            if content_path in errors
+        })
+
+
+def generate_page_recursive_async(
+        dir_path_content: str,
+        template_path: str,
+        dest_dir_path: str,
+        jobs: int = 1,
+        io_workers: int = 8,
+        queue_size: int = 32,
+        minify: bool = False
+) -> None:
+    if not os.path.isdir(dir_path_content):
+        raise ValueError(f'source has to be a directory: {dir_path_content}')
+
+    os.makedirs(dest_dir_path, exist_ok=True)
+    pages = collect_pages(dir_path_content, dest_dir_path)
+    asyncio.run(generate_pages_async(pages, template_path, jobs, io_workers, queue_size, minify))
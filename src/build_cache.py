@@ -0,0 +1,94 @@
+import hashlib
+import os
+import shutil
+import tarfile
+from typing import Iterator, List, Tuple
+
+from render_cache import RENDERER_VERSION
+
+
+class BuildCache:
+    # Content addressed store of rendered pages on disk, meant to be carried between CI runs.
+    # An entry's mtime is its last use, which is what pruning goes by.
+    def __init__(self, path: str, max_size: int = 1 << 30):
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(markdown_hash: str, template_hash: str) -> str:
+        return hashlib.sha256(f'{RENDERER_VERSION}\0{template_hash}\0{markdown_hash}'.encode()).hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key[2:])
+
+    def fetch(self, key: str, dest_path: str) -> bool:
+        entry_path = self.entry_path(key)
+        try:
+            os.utime(entry_path)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        shutil.copyfile(entry_path, dest_path)
+        self.hits += 1
+        return True
+
+    def store(self, key: str, source_path: str) -> None:
+        entry_path = self.entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        # concurrent jobs sharing the directory only ever see complete entries
+        tmp_path = f'{entry_path}.{os.getpid()}.tmp'
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, entry_path)
+
+    def entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        if not os.path.isdir(self.path):
+            return entries
+        with os.scandir(self.path) as prefixes:
+            for prefix in prefixes:
+                if not prefix.is_dir():
+                    continue
+                with os.scandir(prefix.path) as files:
+                    for file in files:
+                        if not file.name.endswith('.tmp'):
+                            stat = file.stat()
+                            entries.append((stat.st_mtime, stat.st_size, file.path))
+        return entries
+
+    def prune(self) -> int:
+        entries = sorted(self.entries())
+        size = sum(entry_size for _, entry_size, _ in entries)
+        removed = 0
+        for _, entry_size, entry_path in entries:
+            if size <= self.max_size:
+                break
+            os.remove(entry_path)
+            size -= entry_size
+            removed += 1
+        return removed
+
+    def export(self, archive_path: str) -> None:
+        with tarfile.open(archive_path, 'w:gz') as archive:
+            for _, _, entry_path in sorted(self.entries(), key=lambda entry: entry[2]):
+                archive.add(entry_path, arcname=os.path.relpath(entry_path, self.path))
+
+    def restore(self, archive_path: str) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        with tarfile.open(archive_path) as archive:
+            if hasattr(tarfile, 'data_filter'):
+                archive.extractall(self.path, filter='data')
+            else:
+                # extraction filters only exist from 3.8.17, 3.9.17, 3.10.12 and 3.11.4 on
+                archive.extractall(self.path, members=cache_members(archive))
+
+
+def cache_members(archive: tarfile.TarFile) -> Iterator[tarfile.TarInfo]:
+    # an exported cache only holds regular files at '<prefix>/<rest of key>', anything else
+    # in the archive, links or paths escaping the cache directory among them, is skipped
+    for member in archive:
+        parts = member.name.split('/')
+        if member.isfile() and len(parts) == 2 and all(part and part not in ('.', '..') for part in parts):
+            yield member
@@ -0,0 +1,115 @@
+import gzip
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple
+
+from handle_files import collect_files, remove_output
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CHUNK_SIZE = 1 << 16
+
+# images, fonts and archives are already compressed
+COMPRESSIBLE_SUFFIXES = ('.html', '.css', '.js', '.mjs', '.json', '.svg', '.txt', '.xml')
+
+
+def gzip_stream(source: BinaryIO, destination: BinaryIO) -> None:
+    # mtime=0 keeps the output identical between builds
+    with gzip.GzipFile(filename='', mode='wb', fileobj=destination, compresslevel=9, mtime=0) as compressed:
+        shutil.copyfileobj(source, compressed, CHUNK_SIZE)
+
+
+def brotli_stream(source: BinaryIO, destination: BinaryIO) -> None:
+    compressor = brotli.Compressor(quality=11)
+    while chunk := source.read(CHUNK_SIZE):
+        destination.write(compressor.process(chunk))
+    destination.write(compressor.finish())
+
+
+# format -> (extension of the compressed sibling, streaming compressor)
+COMPRESSORS: Dict[str, Tuple[str, Callable[[BinaryIO, BinaryIO], None]]] = {'gzip': ('.gz', gzip_stream)}
+if brotli is not None:
+    COMPRESSORS['brotli'] = ('.br', brotli_stream)
+
+
+def compressed_path(path: str, compression: str) -> str:
+    return path + COMPRESSORS[compression][0]
+
+
+def is_compressed_up_to_date(path: str, compression: str) -> bool:
+    # a compressed sibling carries the mtime of the file it was made from
+    try:
+        return os.stat(compressed_path(path, compression)).st_mtime_ns == os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def compress_file(path: str, compression: str) -> None:
+    _, compress = COMPRESSORS[compression]
+    destination_path = compressed_path(path, compression)
+    tmp_path = f'{destination_path}.tmp'
+    with open(path, 'rb') as source, open(tmp_path, 'wb') as destination:
+        stat = os.fstat(source.fileno())
+        compress(source, destination)
+    os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(tmp_path, destination_path)
+
+
+def compress_tree(
+        dest_dir_path: str,
+        compressions: Iterable[str],
+        jobs: int = 1,
+        written: Optional[Dict[str, str]] = None,
+        static_dir: Optional[str] = None
+) -> Dict[str, int]:
+    # written maps the siblings compress_tree made to the files they were made from and is
+    # kept up to date here. Only those siblings are ever deleted, once their file is gone or
+    # their format no longer asked for, so a real archive such as data.tar.gz is left alone.
+    # Without it nothing is deleted. A sibling static_dir ships itself, a hand made x.css.gz
+    # next to x.css, is neither written nor deleted.
+    stats = {'compressed': 0, 'unchanged': 0, 'deleted': 0}
+    compressions = list(compressions)
+    tasks: List[Tuple[str, str]] = []
+
+    def is_shipped(sibling_path: str) -> bool:
+        if static_dir is None:
+            return False
+        return os.path.exists(os.path.join(static_dir, os.path.relpath(sibling_path, dest_dir_path)))
+
+    if written is not None:
+        extensions = {COMPRESSORS[compression][0] for compression in compressions}
+        for sibling_path, path in list(written.items()):
+            if not os.path.exists(sibling_path) or is_shipped(sibling_path):
+                del written[sibling_path]
+            elif not os.path.exists(path) or sibling_path[len(path):] not in extensions:
+                remove_output(sibling_path)
+                del written[sibling_path]
+                stats['deleted'] += 1
+
+    for path, _ in collect_files(dest_dir_path, dest_dir_path):
+        if not path.endswith(COMPRESSIBLE_SUFFIXES):
+            continue
+        for compression in compressions:
+            sibling_path = compressed_path(path, compression)
+            if is_shipped(sibling_path):
+                continue
+            if is_compressed_up_to_date(path, compression):
+                stats['unchanged'] += 1
+            else:
+                tasks.append((path, compression))
+            if written is not None:
+                written[sibling_path] = path
+
+    if jobs <= 1 or len(tasks) <= 1:
+        for path, compression in tasks:
+            compress_file(path, compression)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            paths, compressions = zip(*tasks)
+            list(executor.map(compress_file, paths, compressions, chunksize=16))
+    stats['compressed'] = len(tasks)
+    return stats
@@ -0,0 +1,155 @@
+import argparse
+import mimetypes
+import os
+import posixpath
+import shutil
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from handle_files import read_markdown, render_page_parts
+
+
+class LazySite:
+    # Renders a page the first time it is requested and keeps it until the markdown or the
+    # template changes, instead of building the whole site up front. The least recently
+    # served pages are dropped once they take more than max_size bytes.
+    def __init__(
+            self,
+            static_dir: str,
+            dir_path_content: str,
+            template_path: str,
+            minify: bool = False,
+            max_size: int = 64 << 20
+    ):
+        self.static_dir = static_dir
+        self.dir_path_content = dir_path_content
+        self.template_path = template_path
+        self.minify = minify
+        self.max_size = max_size
+        # content path -> ((mtime, size) of the markdown and the template, rendered page)
+        self.pages: OrderedDict[str, Tuple[Tuple[int, int, int, int], bytes]] = OrderedDict()
+        self.size = 0
+        # requests are served from several threads
+        self.lock = threading.Lock()
+
+    def resolve(self, url_path: str) -> Optional[Tuple[str, str]]:
+        path = posixpath.normpath('/' + unquote(url_path))
+        if url_path.endswith('/'):
+            path = posixpath.join(path, 'index.html')
+        relative = path.lstrip('/')
+
+        if relative.endswith('.html'):
+            content_path = os.path.join(self.dir_path_content, relative[:-len('.html')] + '.md')
+            if os.path.isfile(content_path):
+                return 'page', content_path
+        static_path = os.path.join(self.static_dir, relative)
+        if os.path.isfile(static_path):
+            return 'static', static_path
+        if not url_path.endswith('/') and self.resolve(url_path + '/') is not None:
+            # a directory asked for without its trailing slash, relative links in its index need it
+            return 'redirect', url_path + '/'
+        return None
+
+    def render(self, content_path: str) -> bytes:
+        stat = os.stat(content_path)
+        template_stat = os.stat(self.template_path)
+        version = (stat.st_mtime_ns, stat.st_size, template_stat.st_mtime_ns, template_stat.st_size)
+
+        with self.lock:
+            cached = self.pages.get(content_path)
+            if cached is not None and cached[0] == version:
+                self.pages.move_to_end(content_path)
+                return cached[1]
+        parts = render_page_parts(read_markdown(content_path), self.template_path, minify=self.minify)
+        page = ''.join(parts).encode()
+        self.store(content_path, version, page)
+        return page
+
+    def store(self, content_path: str, version: Tuple[int, int, int, int], page: bytes) -> None:
+        with self.lock:
+            previous = self.pages.pop(content_path, None)
+            if previous is not None:
+                self.size -= len(previous[1])
+            if len(page) > self.max_size:
+                return
+            self.pages[content_path] = (version, page)
+            self.size += len(page)
+            while self.size > self.max_size:
+                _, (_, evicted) = self.pages.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class DevRequestHandler(BaseHTTPRequestHandler):
+    def __init__(self, *args, site: LazySite, **kwargs):
+        self.site = site
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self) -> None:
+        self.respond(send_body=True)
+
+    def do_HEAD(self) -> None:
+        self.respond(send_body=False)
+
+    def respond(self, send_body: bool) -> None:
+        target = self.site.resolve(urlsplit(self.path).path)
+        if target is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        kind, path = target
+        if kind == 'redirect':
+            query = urlsplit(self.path).query
+            self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+            self.send_header('Location', f'{path}?{query}' if query else path)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if kind == 'page':
+            try:
+                page = self.site.render(path)
+            except Exception as error:
+                self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR, explain=repr(error))
+                return
+            self.send_headers('text/html; charset=utf-8', len(page))
+            if send_body:
+                self.wfile.write(page)
+            return
+
+        # static files are streamed as they are, without reading them into memory
+        with open(path, 'rb') as file:
+            content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            self.send_headers(content_type, os.fstat(file.fileno()).st_size)
+            if send_body:
+                shutil.copyfileobj(file, self.wfile)
+
+    def send_headers(self, content_type: str, length: int) -> None:
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(length))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+
+def make_server(site: LazySite, host: str = '', port: int = 8888) -> ThreadingHTTPServer:
+    return ThreadingHTTPServer((host, port), lambda *args: DevRequestHandler(*args, site=site))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the site, rendering pages when they are requested.')
+    parser.add_argument('--host', default='', help='address to bind, all interfaces by default')
+    parser.add_argument('--port', type=int, default=8888)
+    parser.add_argument('--minify', action='store_true', help='strip redundant whitespace from pages')
+    args = parser.parse_args()
+
+    server = make_server(LazySite('static/', 'content/', 'template.html', args.minify), args.host, args.port)
+    print(f'Serving on http://{args.host or "localhost"}:{args.port}/')
+    with server:
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
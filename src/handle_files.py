@@ -1,7 +1,37 @@
+import hashlib
 import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 
-from parse_markdown import markdown_to_html_node, extract_title
+import profiling
+from build_cache import BuildCache
+from link_index import LinkIndex, extract_page_links, update_link_index
+from manifest import hash_file, load_manifest, save_manifest
+from parse_markdown import extract_title, extract_title_from_lines, iter_blocks, iter_mapped_lines, \
+    iter_markdown_html, markdown_to_blocks, markdown_to_html
+from render_cache import RenderCache
+from template import load_template
+
+# ioctl request that asks copy-on-write filesystems (btrfs, xfs) to share the source extents
+FICLONE = 0x40049409
+
+# pages larger than this are rendered block by block instead of being read whole
+STREAMING_THRESHOLD = 8 << 20
+
+
+class BuildError(Exception):
+    def __init__(self, errors: Dict[str, Exception]):
+        self.errors = errors
+        details = '\n'.join(f'{path}: {error!r}' for path, error in errors.items())
+        super().__init__(f'{len(errors)} page(s) failed to build:\n{details}')
+
+
+class ShardCollisionError(Exception):
+    def __init__(self, collisions: Dict[str, List[str]]):
+        self.collisions = collisions
+        details = '\n'.join(f'{path}: {", ".join(shard_dirs)}' for path, shard_dirs in collisions.items())
+        super().__init__(f'{len(collisions)} output(s) written by more than one shard:\n{details}')
 
 
 def move_files(source: str, destination: str) -> None:
@@ -15,51 +45,498 @@ def move_files(source: str, destination: str) -> None:
 
     os.mkdir(destination)
 
-    source_list = os.listdir(source)
-    for item in source_list:
-        source_path = os.path.join(source, item)
-        destination_path = os.path.join(destination, item)
+    dir_paths = {destination}
+    for source_path, destination_path in collect_files(source, destination):
         print(source_path)
-        if os.path.isdir(source_path):
-            move_files(source_path, destination_path)
+        dir_path = os.path.dirname(destination_path)
+        if dir_path not in dir_paths:
+            os.makedirs(dir_path, exist_ok=True)
+            dir_paths.add(dir_path)
+        shutil.copy(source_path, destination_path)
+
+def copy_file(source_path: str, destination_path: str, link: Optional[str] = None) -> None:
+    # never write through an existing destination, it may be a hardlink to a source file
+    remove_output(destination_path)
+    os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+
+    if link == 'hard':
+        try:
+            os.link(source_path, destination_path)
+            return
+        except OSError:
+            pass
+    elif link == 'reflink':
+        try:
+            # fcntl only exists on unix, elsewhere reflinks fall back to a plain copy
+            import fcntl
+            with open(source_path, 'rb') as source_file, open(destination_path, 'wb') as destination_file:
+                fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+            shutil.copystat(source_path, destination_path)
+            return
+        except ImportError:
+            pass
+        except OSError:
+            remove_output(destination_path)
+    elif link is not None:
+        raise ValueError(f'Unknown link mode: {link}')
+
+    shutil.copy2(source_path, destination_path)
+
+def is_up_to_date(
+        source_path: str,
+        destination_path: str,
+        compare: str,
+        hashes: Optional[Dict[str, dict]] = None
+) -> bool:
+    # hashes maps a source path to its size, mtime and hash as of its last copy; with it a
+    # source is only read again when its size or mtime moved, and the destination never is
+    try:
+        destination_stat = os.stat(destination_path)
+    except FileNotFoundError:
+        return False
+    source_stat = os.stat(source_path)
+
+    if compare == 'mtime':
+        return (
+            source_stat.st_size == destination_stat.st_size
+            and source_stat.st_mtime_ns == destination_stat.st_mtime_ns
+        )
+    if compare != 'hash':
+        raise ValueError(f'Unknown compare mode: {compare}')
+    if source_stat.st_size != destination_stat.st_size:
+        return False
+
+    previous = None if hashes is None else hashes.get(source_path)
+    if previous is None:
+        return hash_file(source_path) == hash_file(destination_path)
+    if previous['size'] == source_stat.st_size and previous['mtime'] == source_stat.st_mtime_ns:
+        return True
+    if hash_file(source_path) != previous['hash']:
+        return False
+    # only touched, remember the new mtime so it is not hashed again
+    previous['mtime'] = source_stat.st_mtime_ns
+    return True
+
+def record_hash(hashes: Dict[str, dict], source_path: str) -> None:
+    stat = os.stat(source_path)
+    previous = hashes.get(source_path)
+    if previous is not None and previous['size'] == stat.st_size and previous['mtime'] == stat.st_mtime_ns:
+        return
+    hashes[source_path] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': hash_file(source_path)}
+
+def sync_files(
+        source: str,
+        destination: str,
+        compare: str = 'mtime',
+        link: Optional[str] = None,
+        keep: Optional[Set[str]] = None,
+        hashes: Optional[Dict[str, dict]] = None
+) -> Dict[str, int]:
+    if not os.path.isdir(source):
+        raise ValueError(f'source has to be a directory: {source}')
+
+    stats = {'copied': 0, 'unchanged': 0, 'deleted': 0}
+    expected = {os.path.normpath(path) for path in keep or ()}
+    sources = set()
+
+    for source_path, destination_path in collect_files(source, destination):
+        expected.add(os.path.normpath(destination_path))
+        sources.add(source_path)
+        if is_up_to_date(source_path, destination_path, compare, hashes):
+            stats['unchanged'] += 1
         else:
-            shutil.copy(source_path, destination_path)
+            copy_file(source_path, destination_path, link)
+            stats['copied'] += 1
+        if hashes is not None and compare == 'hash':
+            record_hash(hashes, source_path)
+
+    if hashes is not None:
+        for source_path in set(hashes) - sources:
+            del hashes[source_path]
+
+    os.makedirs(destination, exist_ok=True)
+    for dir_path, dir_names, file_names in os.walk(destination, topdown=False):
+        for file_name in file_names:
+            path = os.path.join(dir_path, file_name)
+            if os.path.normpath(path) not in expected:
+                os.remove(path)
+                stats['deleted'] += 1
+        if os.path.normpath(dir_path) != os.path.normpath(destination) and not os.listdir(dir_path):
+            os.rmdir(dir_path)
 
-def generate_page(from_path: str, template_path: str, dest_path: str) -> None:
+    return stats
+
+def generate_page(
+        from_path: str,
+        template_path: str,
+        dest_path: str,
+        cache: Optional[RenderCache] = None,
+        minify: bool = False
+) -> None:
     print(f'Generating page from "{from_path}" to "{dest_path}" using "{template_path}"')
 
-    with open(from_path) as file:
-        markdown = file.read()
+    size = os.path.getsize(from_path)
+    if size > STREAMING_THRESHOLD:
+        with profiling.page(from_path):
+            generate_page_streaming(from_path, template_path, dest_path, minify, cache)
+        return
 
-    with open(template_path) as file:
-        template_text = file.read()
+    with profiling.page(from_path):
+        with profiling.stage('read', size):
+            markdown = read_markdown(from_path)
 
-    content = markdown_to_html_node(markdown).to_html()
-    title = extract_title(markdown)
+        # the template pieces are written as they are made, never joined into a single string
+        parts = iter_page_parts(markdown, template_path, cache, minify)
+
+        with profiling.stage('write') as timer:
+            write_page(dest_path, parts)
+            if profiling.active_profiler is not None:
+                timer.bytes = os.path.getsize(dest_path)
 
-    site = template_text.replace('{{ Title }}', title).replace('{{ Content }}', content)
+def is_large_page(from_path: str) -> bool:
+    # such pages are rendered by generate_page_streaming instead of being read whole
+    return os.path.getsize(from_path) > STREAMING_THRESHOLD
 
+def read_markdown(from_path: str) -> str:
+    with open(from_path) as file:
+        return file.read()
+
+def write_page(dest_path: str, parts: Iterable[str]) -> None:
     if not os.path.exists(dest_path):
         dir_path = os.path.dirname(dest_path)
         os.makedirs(dir_path, exist_ok=True)
 
-    with open(dest_path, 'w+') as file:
-        file.write(site)
+    # parts may still be rendering, so a page that fails half way must not replace the output
+    tmp_path = f'{dest_path}.tmp'
+    try:
+        with open(tmp_path, 'w') as file:
+            file.writelines(parts)
+    except BaseException:
+        remove_output(tmp_path)
+        raise
+    os.replace(tmp_path, dest_path)
+
+def render_page_parts(
+        markdown: str,
+        template_path: str,
+        cache: Optional[RenderCache] = None,
+        minify: bool = False
+) -> List[str]:
+    return list(iter_page_parts(markdown, template_path, cache, minify))
+
+def iter_page_parts(
+        markdown: str,
+        template_path: str,
+        cache: Optional[RenderCache] = None,
+        minify: bool = False
+) -> Iterable[str]:
+    template = load_template(template_path, minify)
+    title = extract_title(markdown)
+
+    # markdown_to_html parses and serializes block by block, so there is no separate parse
+    # stage: blocks and inline nest in 'serialize', whose self time is the serialization
+    content: Optional[Iterable[str]] = None
+    if cache is not None:
+        key = cache.key('page', markdown)
+        content = cache.get(key)
+        if content is None:
+            # the cache needs the whole content as one string
+            with profiling.stage('serialize') as timer:
+                content = markdown_to_html(markdown, cache)
+                timer.bytes = len(content)
+            cache.put(key, content)
+    else:
+        content = profiling.iter_stage('serialize', iter_markdown_html(markdown_to_blocks(markdown)))
+
+    return profiling.iter_stage('template', template.iter_render({'Title': title, 'Content': content}))
 
-def generate_page_recursive(dir_path_content: str, template_path: str, dest_dir_path: str) -> None:
+def generate_page_streaming(
+        from_path: str,
+        template_path: str,
+        dest_path: str,
+        minify: bool = False,
+        cache: Optional[RenderCache] = None
+) -> None:
+    template = load_template(template_path, minify)
+
+    # a first cheap pass finds the title, which the template needs before the content
+    title = extract_title_from_lines(iter_mapped_lines(from_path))
+
+    # the page as a whole is never in memory here, so only its blocks are cached
+    content = iter_markdown_html(iter_blocks(iter_mapped_lines(from_path)), cache)
+    parts = template.iter_render({'Title': title, 'Content': profiling.iter_stage('serialize', content)})
+    with profiling.stage('write') as timer:
+        write_page(dest_path, profiling.iter_stage('template', parts))
+        if profiling.active_profiler is not None:
+            timer.bytes = os.path.getsize(dest_path)
+
+def generate_page_profiled(
+        from_path: str,
+        template_path: str,
+        dest_path: str,
+        minify: bool = False
+) -> profiling.Profiler:
+    profiler = profiling.enable()
+    try:
+        generate_page(from_path, template_path, dest_path, minify=minify)
+    finally:
+        profiling.disable()
+    return profiler
+
+def generate_pages(
+        pages: List[Tuple[str, str]],
+        template_path: str,
+        jobs: int = 1,
+        cache: Optional[RenderCache] = None,
+        build_cache: Optional[BuildCache] = None,
+        minify: bool = False
+) -> None:
+    errors: Dict[str, Exception] = {}
+
+    keys: Dict[str, str] = {}
+    if build_cache is not None:
+        pages, keys = fetch_cached_pages(pages, template_path, build_cache, minify)
+
+    # the render cache lives in this process, so it only serves serial builds
+    if jobs <= 1:
+        for content_path, destination_path in pages:
+            try:
+                generate_page(content_path, template_path, destination_path, cache, minify)
+            except Exception as error:
+                errors[content_path] = error
+    else:
+        # workers run their own profiler per page and hand it back to be merged here
+        profiler = profiling.active_profiler
+        render = generate_page if profiler is None else generate_page_profiled
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                (content_path, executor.submit(render, content_path, template_path, destination_path, minify=minify))
+                for content_path, destination_path in pages
+            ]
+            # collect in plan order so the error report does not depend on worker scheduling
+            for content_path, future in futures:
+                try:
+                    page_profiler = future.result()
+                except Exception as error:
+                    errors[content_path] = error
+                    continue
+                if profiler is not None:
+                    profiler.merge(page_profiler)
+
+    for content_path, destination_path in pages:
+        if content_path in keys and content_path not in errors:
+            build_cache.store(keys[content_path], destination_path)
+
+    if errors:
+        raise BuildError(errors)
+
+def fetch_cached_pages(
+        pages: List[Tuple[str, str]],
+        template_path: str,
+        build_cache: BuildCache,
+        minify: bool = False
+) -> Tuple[List[Tuple[str, str]], Dict[str, str]]:
+    # copies every page the cache already holds into place and returns the ones left to render
+    template_hash = template_fingerprint(template_path, minify)
+    pending = []
+    keys = {}
+    for content_path, destination_path in pages:
+        key = build_cache.key(hash_file(content_path), template_hash)
+        if not build_cache.fetch(key, destination_path):
+            pending.append((content_path, destination_path))
+            keys[content_path] = key
+    return pending, keys
+
+def generate_page_recursive(
+        dir_path_content: str,
+        template_path: str,
+        dest_dir_path: str,
+        jobs: int = 1,
+        cache: Optional[RenderCache] = None,
+        shard: Optional[Tuple[int, int]] = None,
+        build_cache: Optional[BuildCache] = None,
+        minify: bool = False
+) -> None:
+    if not os.path.isdir(dir_path_content):
+        raise ValueError(f'source has to be a directory: {dir_path_content}')
+
+    os.makedirs(dest_dir_path, exist_ok=True)
+    pages = collect_pages(dir_path_content, dest_dir_path)
+    if shard is not None:
+        index, shards = shard
+        pages = [
+            (content_path, destination_path)
+            for content_path, destination_path in pages
+            if shard_of(os.path.relpath(content_path, dir_path_content), shards) == index
+        ]
+    generate_pages(pages, template_path, jobs, cache, build_cache, minify)
+
+def template_fingerprint(template_path: str, minify: bool = False) -> str:
+    # pages rendered with and without minifying must not be taken for one another
+    template_hash = hash_file(template_path)
+    return f'{template_hash}:minify' if minify else template_hash
+
+def shard_of(path: str, shards: int) -> int:
+    # sha256 rather than hash(), which is salted per process, so every machine agrees on the split
+    digest = hashlib.sha256(path.replace(os.sep, '/').encode()).digest()
+    return int.from_bytes(digest[:8], 'big') % shards
+
+def merge_shards(shard_dirs: List[str], dest_dir_path: str, static_dir: Optional[str] = None) -> int:
+    # static_dir holds the assets copied into dest_dir_path next to the shards, which no
+    # shard may overwrite either; they are only checked here, not copied
+    owners: Dict[str, List[str]] = {}
+    files: List[Tuple[str, str]] = []
+    if static_dir is not None:
+        for _, destination_path in collect_files(static_dir, dest_dir_path):
+            owners.setdefault(os.path.relpath(destination_path, dest_dir_path), []).append(static_dir)
+    for shard_dir in shard_dirs:
+        for source_path, destination_path in collect_files(shard_dir, dest_dir_path):
+            owners.setdefault(os.path.relpath(destination_path, dest_dir_path), []).append(shard_dir)
+            files.append((source_path, destination_path))
+
+    # check everything before copying so a bad partition never leaves a half merged site
+    collisions = {path: shard_dirs for path, shard_dirs in owners.items() if len(shard_dirs) > 1}
+    if collisions:
+        raise ShardCollisionError(collisions)
+
+    for source_path, destination_path in files:
+        copy_file(source_path, destination_path)
+    return len(files)
+
+def collect_files(source: str, destination: str) -> List[Tuple[str, str]]:
+    # Depth first with an explicit stack instead of recursion, so deep trees cannot hit the
+    # recursion limit. DirEntry caches the file type, which saves a stat per entry. Entries
+    # are sorted per directory, so every machine gets the same plan. Symlinked directories
+    # are followed, except into a directory being walked already, which would never end.
+    files = []
+    stack: List[Tuple[str, str, bool, FrozenSet[Tuple[int, int]]]] = [(source, destination, True, frozenset())]
+    while stack:
+        source_path, destination_path, is_dir, ancestors = stack.pop()
+        if not is_dir:
+            files.append((source_path, destination_path))
+            continue
+        stat = os.stat(source_path)
+        dir_id = (stat.st_dev, stat.st_ino)
+        if dir_id in ancestors:
+            continue
+        ancestors = ancestors | {dir_id}
+        with os.scandir(source_path) as entries:
+            children = sorted(entries, key=lambda entry: entry.name)
+        stack.extend(
+            (entry.path, os.path.join(destination_path, entry.name), entry.is_dir(), ancestors)
+            for entry in reversed(children)
+        )
+    return files
+
+def collect_pages(dir_path_content: str, dest_dir_path: str) -> List[Tuple[str, str]]:
+    return [
+        (content_path, destination_path.replace('.md', '.html'))
+        for content_path, destination_path in collect_files(dir_path_content, dest_dir_path)
+    ]
+
+def remove_output(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+def generate_site_incremental(
+        static_dir: str,
+        dir_path_content: str,
+        template_path: str,
+        dest_dir_path: str,
+        manifest_path: str,
+        jobs: int = 1,
+        cache: Optional[RenderCache] = None,
+        link_index_path: Optional[str] = None,
+        minify: bool = False,
+        link: Optional[str] = None
+) -> Dict[str, int]:
+    if not os.path.isdir(static_dir):
+        raise ValueError(f'source has to be a directory: {static_dir}')
     if not os.path.isdir(dir_path_content):
         raise ValueError(f'source has to be a directory: {dir_path_content}')
 
-    if not os.path.exists(dest_dir_path):
-        os.mkdir(dest_dir_path)
+    manifest = load_manifest(manifest_path)
+    template_hash = template_fingerprint(template_path, minify)
+    rebuild_all = manifest['template'] != template_hash or not os.path.isdir(dest_dir_path)
+    stats = {'generated': 0, 'copied': 0, 'deleted': 0, 'unchanged': 0}
 
-    content_list = os.listdir(dir_path_content)
-    for item in content_list:
-        content_path = os.path.join(dir_path_content, item)
-        destination_path = os.path.join(dest_dir_path, item)
-        print(content_path)
-        if os.path.isdir(content_path):
-            generate_page_recursive(content_path, template_path, destination_path)
+    assets: Dict[str, dict] = {}
+    for source_path, destination_path in collect_files(static_dir, dest_dir_path):
+        stat = os.stat(source_path)
+        previous = manifest['assets'].get(source_path)
+        if previous is not None and previous.get('size') == stat.st_size and previous.get('mtime') == stat.st_mtime_ns:
+            # same size and mtime as last time, the file is not read again
+            source_hash = previous['hash']
         else:
-            destination_path = destination_path.replace('.md', '.html')
-            generate_page(content_path, template_path, destination_path)
+            source_hash = hash_file(source_path)
+        assets[source_path] = {
+            'hash': source_hash, 'dest': destination_path, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+        if (previous is not None and previous['hash'] == source_hash and previous['dest'] == destination_path
+                and os.path.exists(destination_path)):
+            stats['unchanged'] += 1
+            continue
+        copy_file(source_path, destination_path, link)
+        stats['copied'] += 1
+
+    pages: Dict[str, dict] = {}
+    dirty: Set[str] = set()
+    page_links: Dict[str, Tuple[List[str], List[str]]] = {}
+    for content_path, destination_path in collect_pages(dir_path_content, dest_dir_path):
+        if link_index_path is None:
+            content_hash = hash_file(content_path)
+        else:
+            # read once for both the hash and, if the page changed, its links
+            with open(content_path, 'rb') as file:
+                data = file.read()
+            content_hash = hashlib.sha256(data).hexdigest()
+        previous = manifest['pages'].get(content_path)
+        pages[content_path] = {'hash': content_hash, 'dest': destination_path}
+        if rebuild_all or previous != pages[content_path] or not os.path.exists(destination_path):
+            dirty.add(content_path)
+            if link_index_path is not None:
+                try:
+                    # newlines translated as text mode would
+                    markdown = data.decode().replace('\r\n', '\n').replace('\r', '\n')
+                    page_links[content_path] = extract_page_links(markdown)
+                except Exception:
+                    # the page fails to render the same way, which generate_pages reports with the others
+                    page_links[content_path] = ([], [])
+
+    link_index = None
+    if link_index_path is not None:
+        # pages linking to a page that was added or removed render again as well
+        link_index = LinkIndex.load(link_index_path)
+        dirty |= update_link_index(link_index, manifest['pages'], pages, page_links, dest_dir_path)
+
+    dirty_pages = [(content_path, entry['dest']) for content_path, entry in pages.items() if content_path in dirty]
+    stats['generated'] += len(dirty_pages)
+    stats['unchanged'] += len(pages) - len(dirty_pages)
+
+    build_error = None
+    try:
+        generate_pages(dirty_pages, template_path, jobs, cache, minify=minify)
+    except BuildError as error:
+        # forget the hash of failed pages so the next build retries them
+        build_error = error
+        for content_path in error.errors:
+            pages[content_path]['hash'] = None
+
+    outputs = {entry['dest'] for entry in assets.values()} | {entry['dest'] for entry in pages.values()}
+    for previous_entries, current_entries in ((manifest['assets'], assets), (manifest['pages'], pages)):
+        for source_path, entry in previous_entries.items():
+            if source_path not in current_entries and entry['dest'] not in outputs:
+                remove_output(entry['dest'])
+                stats['deleted'] += 1
+
+    if link_index is not None:
+        link_index.save(link_index_path)
+    save_manifest(manifest_path, {
+        'version': manifest['version'],
+        'template': template_hash,
+        'pages': pages,
+        'assets': assets,
+    })
+
+    if build_error is not None:
+        raise build_error
+    return stats
@@ -1,7 +1,9 @@
-from typing import List, Optional
+from typing import Iterator, List, Optional, TextIO
 
 
 class HTMLNode:
+    __slots__ = ('tag', 'value', 'children', 'props')
+
     def __init__(
             self,
             tag: Optional[str] = None,
@@ -15,8 +17,14 @@ class HTMLNode:
        self.props = props
 
     def to_html(self):
+        return ''.join(self.iter_html())
+
+    def iter_html(self) -> Iterator[str]:
         raise NotImplementedError
 
+    def write_html(self, file: TextIO) -> None:
+        file.writelines(self.iter_html())
+
     def props_to_html(self):
         string = ''
         if self.props is not None:
@@ -29,6 +37,8 @@ class HTMLNode:
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(
             self,
             tag: Optional[str] = None,
@@ -37,15 +47,18 @@ class LeafNode(HTMLNode):
     ):
         super().__init__(tag, value, props=props)
 
-    def to_html(self):
+    def iter_html(self) -> Iterator[str]:
         if self.value is None:
             raise ValueError('LeafNodes must have a value')
         if self.tag is None:
-            return self.value
-        return f'<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>'
+            yield self.value
+        else:
+            yield f'<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>'
 
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(
             self,
             tag: Optional[str] = None,
@@ -54,16 +67,26 @@ class ParentNode(HTMLNode):
     ):
         super().__init__(tag=tag, children=children, props=props)
 
-    def to_html(self):
+    def check_renderable(self) -> None:
         if self.children is None:
             raise ValueError('A ParentNode must have children.')
         if self.tag is None:
             raise ValueError('A ParentNode must have a tag.')
 
-        string = f'<{self.tag}>'
-        for child in self.children:
-            string += child.to_html()
-
-        string += f'</{self.tag}>'
-
-        return string
+    def iter_html(self) -> Iterator[str]:
+        # walk nested ParentNodes with an explicit stack so deep trees do not hit the recursion limit
+        self.check_renderable()
+        yield f'<{self.tag}>'
+        stack = [(self.tag, iter(self.children))]
+        while stack:
+            tag, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                yield f'</{tag}>'
+            elif isinstance(child, ParentNode):
+                child.check_renderable()
+                yield f'<{child.tag}>'
+                stack.append((child.tag, iter(child.children)))
+            else:
+                yield from child.iter_html()
@@ -0,0 +1,169 @@
+import json
+import os
+import posixpath
+import zlib
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from parse_markdown import BlockType, classify_block, markdown_to_blocks, ordered_list_items, quote_text, \
+    text_to_textnodes, unordered_list_items
+from textnode import TextType
+
+INDEX_VERSION = 2
+
+# block type -> the inline texts the block renders; code, headings and custom blocks render no links
+INLINE_TEXTS: Dict[Hashable, Callable[[str], List[str]]] = {
+    BlockType.PARAGRAPH: lambda block: [block],
+    BlockType.QUOTE: lambda block: [quote_text(block)],
+    BlockType.UNORDERED_LIST: unordered_list_items,
+    BlockType.ORDERED_LIST: ordered_list_items,
+}
+
+
+def page_url(dest_path: str, dest_dir_path: str) -> str:
+    return '/' + os.path.relpath(dest_path, dest_dir_path).replace(os.sep, '/')
+
+
+def resolve_link(page: str, url: str) -> Optional[str]:
+    # site path an internal link points to, or None for external links and in-page anchors
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    path = parts.path
+    if not path.startswith('/'):
+        path = posixpath.join(posixpath.dirname(page), path)
+    resolved = posixpath.normpath(path)
+    if path.endswith('/'):
+        resolved = posixpath.join(resolved, 'index.html')
+    return resolved
+
+
+def extract_page_links(markdown: str) -> Tuple[List[str], List[str]]:
+    links: List[str] = []
+    images: List[str] = []
+    for block in markdown_to_blocks(markdown):
+        inline_texts = INLINE_TEXTS.get(classify_block(block).block_type)
+        if inline_texts is None:
+            continue
+        # the same nodes the page renders, so links in inline code are not counted
+        for text in inline_texts(block):
+            for text_node in text_to_textnodes(text):
+                if text_node.text_type is TextType.LINK:
+                    links.append(text_node.url)
+                elif text_node.text_type is TextType.IMAGE:
+                    images.append(text_node.url)
+    return links, images
+
+
+class LinkIndex:
+    def __init__(self):
+        # page site path -> (outgoing link urls, image urls), as written in the markdown
+        self.pages: Dict[str, Tuple[List[str], List[str]]] = {}
+
+    def update(self, page: str, links: List[str], images: List[str]) -> None:
+        self.pages[page] = (links, images)
+
+    def remove(self, page: str) -> None:
+        self.pages.pop(page, None)
+
+    def targets(self, page: str) -> Set[str]:
+        links, images = self.pages.get(page, ((), ()))
+        resolved = {resolve_link(page, url) for url in (*links, *images)}
+        resolved.discard(None)
+        return resolved
+
+    def backlinks(self, target: str) -> List[str]:
+        return sorted(page for page in self.pages if target in self.targets(page))
+
+    def dependents(self, targets: Iterable[str]) -> Set[str]:
+        targets = set(targets)
+        return {page for page in self.pages if not targets.isdisjoint(self.targets(page))}
+
+    def broken_links(self, site_paths: Set[str]) -> Dict[str, List[str]]:
+        broken = {}
+        known = site_paths | {None}
+        for page in sorted(self.pages):
+            links, images = self.pages[page]
+            missing = [url for url in (*links, *images) if resolve_link(page, url) not in known]
+            if missing:
+                broken[page] = missing
+        return broken
+
+    def save(self, path: str) -> None:
+        # urls are stored once in a string table and referenced by position
+        urls: Dict[str, int] = {}
+        pages = {}
+        for page, (links, images) in sorted(self.pages.items()):
+            pages[page] = [
+                [urls.setdefault(url, len(urls)) for url in links],
+                [urls.setdefault(url, len(urls)) for url in images],
+            ]
+        data = json.dumps({'version': INDEX_VERSION, 'urls': list(urls), 'pages': pages}, separators=(',', ':'))
+
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(zlib.compress(data.encode(), 6))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'LinkIndex':
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        try:
+            with open(path, 'rb') as file:
+                data = json.loads(zlib.decompress(file.read()))
+        except (OSError, ValueError, zlib.error):
+            return index
+        if data.get('version') != INDEX_VERSION:
+            return index
+
+        urls = data['urls']
+        for page, (links, images) in data['pages'].items():
+            index.pages[page] = ([urls[url] for url in links], [urls[url] for url in images])
+        return index
+
+
+def site_paths(dest_dir_path: str) -> Set[str]:
+    paths = set()
+    for dir_path, _, file_names in os.walk(dest_dir_path):
+        for file_name in file_names:
+            paths.add(page_url(os.path.join(dir_path, file_name), dest_dir_path))
+    return paths
+
+
+def build_link_index(pages: Iterable[Tuple[str, str]], dest_dir_path: str) -> LinkIndex:
+    index = LinkIndex()
+    for content_path, destination_path in pages:
+        with open(content_path) as file:
+            links, images = extract_page_links(file.read())
+        index.update(page_url(destination_path, dest_dir_path), links, images)
+    return index
+
+
+def update_link_index(
+        index: LinkIndex,
+        previous_pages: Dict[str, dict],
+        pages: Dict[str, dict],
+        page_links: Dict[str, Tuple[List[str], List[str]]],
+        dest_dir_path: str
+) -> Set[str]:
+    # Brings the index up to date with the manifest's page entries and returns the content
+    # paths that link to a page which appeared or disappeared since the previous build.
+    # page_links holds the links of the pages that changed, extracted while they were read.
+    previous_urls = {page_url(entry['dest'], dest_dir_path) for entry in previous_pages.values()}
+    urls = {content_path: page_url(entry['dest'], dest_dir_path) for content_path, entry in pages.items()}
+    current_urls = set(urls.values())
+    affected = index.dependents(previous_urls ^ current_urls)
+
+    for url in previous_urls - current_urls:
+        index.remove(url)
+    for content_path, url in urls.items():
+        if content_path in page_links:
+            index.update(url, *page_links[content_path])
+        elif url not in index.pages:
+            with open(content_path) as file:
+                links, images = extract_page_links(file.read())
+            index.update(url, links, images)
+
+    return {content_path for content_path, url in urls.items() if url in affected}
@@ -1,9 +1,249 @@
-from handle_files import move_files
-from handle_files import generate_page_recursive
+import argparse
+import os
+import shutil
+from typing import Tuple
+
+import profiling
+from handle_files import move_files, sync_files
+from handle_files import collect_pages, generate_page_recursive, generate_site_incremental, merge_shards
+from manifest import load_manifest, save_manifest
+from link_index import LinkIndex, build_link_index, site_paths
+from build_cache import BuildCache
+from compress import COMPRESSORS, compress_tree
+from async_build import generate_page_recursive_async
+from render_cache import RenderCache
+from watch import SiteWatcher
+
+
+def shard_spec(value: str) -> Tuple[int, int]:
+    index, _, shards = value.partition('/')
+    try:
+        index, shards = int(index), int(shards)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected I/N, got {value!r}')
+    if not 0 <= index < shards:
+        raise argparse.ArgumentTypeError(f'shard index has to be between 0 and N-1: {value}')
+    return index, shards
+
+
+def clear_stale_shards(shard_dir: str, shards: int) -> None:
+    # shards left by an earlier build split into more parts would be merged as well
+    if not os.path.isdir(shard_dir):
+        return
+    for name in os.listdir(shard_dir):
+        if name.isdigit() and int(name) >= shards:
+            shutil.rmtree(os.path.join(shard_dir, name))
 
 
 def main():
-    move_files('static/', 'public/')
-    generate_page_recursive('content/', 'template.html', 'public/')
+    parser = argparse.ArgumentParser(description='Build the static site into public/.')
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='only regenerate, copy or delete what changed since the last build')
+    parser.add_argument(
+        '--manifest',
+        default='.build-manifest.json',
+        help='where the incremental build keeps its manifest')
+    parser.add_argument(
+        '--link-index',
+        default='.link-index',
+        help='where the incremental build keeps the site-wide link index')
+    parser.add_argument(
+        '--check-links',
+        action='store_true',
+        help='report internal links and images that point to missing pages or files')
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='number of worker processes used to render pages')
+    parser.add_argument(
+        '--async',
+        dest='use_async',
+        action='store_true',
+        help='overlap reading and writing pages with rendering (for slow or network file systems)')
+    parser.add_argument(
+        '--sync',
+        choices=['mtime', 'hash'],
+        help='copy only new or changed static files, comparing size and mtime or content hashes')
+    parser.add_argument(
+        '--link',
+        choices=['hard', 'reflink'],
+        help='with --sync or --incremental, link static files into public/ instead of copying them when possible')
+    parser.add_argument(
+        '--sync-manifest',
+        default='.sync-manifest.json',
+        help='where --sync hash keeps the hashes of the static files it copied')
+    parser.add_argument(
+        '--render-cache',
+        metavar='PATH',
+        help='reuse rendered blocks and pages from a persistent cache (serial builds only)')
+    parser.add_argument(
+        '--build-cache',
+        metavar='DIR',
+        help='copy pages whose markdown, template and renderer are unchanged from a cache shared between builds')
+    parser.add_argument(
+        '--build-cache-size',
+        type=int,
+        default=1024,
+        metavar='MB',
+        help='prune the least recently used build cache entries beyond this size')
+    parser.add_argument(
+        '--build-cache-archive',
+        metavar='PATH',
+        help='restore the build cache from this tarball before building and export it there afterwards')
+    parser.add_argument(
+        '--minify',
+        action='store_true',
+        help='strip redundant whitespace from pages, leaving <pre> and <code> content as it is')
+    parser.add_argument(
+        '--compress',
+        action='append',
+        choices=sorted(COMPRESSORS),
+        default=[],
+        help='also write precompressed siblings of pages and text assets, skipping those still up to date '
+             'and those static/ ships itself (may be given more than once)')
+    parser.add_argument(
+        '--compress-manifest',
+        default='.compress-manifest.json',
+        help='where --compress records the siblings it wrote, the only ones it ever deletes')
+    parser.add_argument(
+        '--profile',
+        metavar='PATH',
+        help='time every build stage and page, print a summary and write a JSON report to PATH')
+    parser.add_argument(
+        '--profile-top',
+        type=int,
+        default=10,
+        help='number of slowest pages listed in the profile')
+    parser.add_argument(
+        '--shard',
+        type=shard_spec,
+        metavar='I/N',
+        help='only build the pages of shard I out of N into SHARD_DIR/I, to be merged later')
+    parser.add_argument(
+        '--shard-dir',
+        default='shards/',
+        help='where sharded builds write their output')
+    parser.add_argument(
+        '--merge-shards',
+        action='store_true',
+        help='copy static files and every shard in SHARD_DIR into public/, failing on any collision')
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='after building, keep rebuilding the pages and assets that change')
+    args = parser.parse_args()
+    if args.shard is not None and (
+            args.incremental or args.merge_shards or args.watch or args.check_links or args.compress):
+        parser.error('--shard only builds pages and cannot be combined with other build modes')
+    if args.merge_shards and args.incremental:
+        parser.error('--merge-shards cannot be combined with --incremental')
+    if args.sync and args.incremental:
+        # the incremental manifest already keeps the size, mtime and hash of every static file
+        parser.error('--sync cannot be combined with --incremental, which only copies changed static files itself')
+    if args.link and not (args.sync or args.incremental):
+        parser.error('--link requires --sync or --incremental')
+    if args.use_async and (args.incremental or args.shard is not None or args.merge_shards):
+        parser.error('--async only applies to plain builds, not --incremental, --shard or --merge-shards')
+    if args.render_cache and (args.jobs > 1 or args.use_async):
+        # worker processes would each fill their own copy of the cache and throw it away
+        parser.error('--render-cache only works for serial builds, without --jobs or --async')
+    if args.build_cache and (args.incremental or args.use_async):
+        parser.error('--build-cache cannot be combined with --incremental or --async')
+    if args.build_cache_archive and not args.build_cache:
+        parser.error('--build-cache-archive requires --build-cache')
+
+    cache = RenderCache(path=args.render_cache) if args.render_cache else None
+    profiler = profiling.enable() if args.profile else None
+
+    build_cache = None
+    if args.build_cache:
+        build_cache = BuildCache(args.build_cache, args.build_cache_size << 20)
+        if args.build_cache_archive and os.path.exists(args.build_cache_archive):
+            build_cache.restore(args.build_cache_archive)
+
+    # the compressed siblings written by earlier builds, so --sync does not take them for stale outputs
+    compress_manifest = load_manifest(args.compress_manifest) if args.compress else None
+
+    output_dir = 'public/'
+    if args.shard is not None:
+        output_dir = os.path.join(args.shard_dir, str(args.shard[0]))
+        if os.path.exists(output_dir):
+            shutil.rmtree(output_dir)
+        clear_stale_shards(args.shard_dir, args.shard[1])
+        generate_page_recursive(
+            'content/', 'template.html', output_dir,
+            jobs=args.jobs, cache=cache, shard=args.shard, build_cache=build_cache, minify=args.minify)
+    elif args.incremental:
+        stats = generate_site_incremental(
+            'static/', 'content/', 'template.html', 'public/', args.manifest,
+            jobs=args.jobs, cache=cache, link_index_path=args.link_index, minify=args.minify, link=args.link)
+        print(', '.join(f'{count} {name}' for name, count in stats.items()))
+    else:
+        if args.sync:
+            keep = {destination_path for _, destination_path in collect_pages('content/', 'public/')}
+            if compress_manifest is not None:
+                keep.update(compress_manifest['assets'])
+            if args.sync == 'hash':
+                sync_manifest = load_manifest(args.sync_manifest)
+                sync_files(
+                    'static/', 'public/', compare='hash', link=args.link, keep=keep, hashes=sync_manifest['assets'])
+                save_manifest(args.sync_manifest, sync_manifest)
+            else:
+                sync_files('static/', 'public/', compare='mtime', link=args.link, keep=keep)
+        else:
+            move_files('static/', 'public/')
+        if args.merge_shards:
+            shard_dirs = [
+                os.path.join(args.shard_dir, name)
+                for name in sorted(os.listdir(args.shard_dir))
+                if os.path.isdir(os.path.join(args.shard_dir, name))
+            ]
+            merged = merge_shards(shard_dirs, 'public/', 'static/')
+            print(f'merged {merged} files from {len(shard_dirs)} shards')
+        elif args.use_async:
+            generate_page_recursive_async('content/', 'template.html', 'public/', jobs=args.jobs, minify=args.minify)
+        else:
+            generate_page_recursive(
+                'content/', 'template.html', 'public/',
+                jobs=args.jobs, cache=cache, build_cache=build_cache, minify=args.minify)
+
+    if args.compress:
+        stats = compress_tree(
+            output_dir, args.compress, jobs=args.jobs, written=compress_manifest['assets'], static_dir='static/')
+        save_manifest(args.compress_manifest, compress_manifest)
+        print('compression: ' + ', '.join(f'{count} {name}' for name, count in stats.items()))
+
+    if cache is not None:
+        cache.save()
+        print(f'render cache: {cache.hits} hits, {cache.misses} misses, {len(cache)} entries')
+
+    if build_cache is not None:
+        pruned = build_cache.prune()
+        if args.build_cache_archive:
+            build_cache.export(args.build_cache_archive)
+        print(f'build cache: {build_cache.hits} hits, {build_cache.misses} misses, {pruned} pruned')
+
+    if profiler is not None:
+        profiling.disable()
+        print(profiler.summary(args.profile_top))
+        profiler.write_json(args.profile, args.profile_top)
+
+    if args.check_links:
+        if args.incremental:
+            link_index = LinkIndex.load(args.link_index)
+        else:
+            link_index = build_link_index(collect_pages('content/', 'public/'), 'public/')
+        broken = link_index.broken_links(site_paths('public/'))
+        for page, urls in broken.items():
+            for url in urls:
+                print(f'broken link in {page}: {url}')
+        if broken:
+            raise SystemExit(1)
+
+    if args.watch:
+        SiteWatcher('static/', 'content/', 'template.html', 'public/', args.minify).run()
 
-main()
\ No newline at end of file
+main()
@@ -0,0 +1,44 @@
+import hashlib
+import json
+import os
+
+MANIFEST_VERSION = 1
+
+
+def empty_manifest() -> dict:
+    return {'version': MANIFEST_VERSION, 'template': None, 'pages': {}, 'assets': {}}
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(path: str) -> dict:
+    if not os.path.exists(path):
+        return empty_manifest()
+
+    try:
+        with open(path) as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return empty_manifest()
+
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return empty_manifest()
+    return manifest
+
+
+def save_manifest(path: str, manifest: dict) -> None:
+    dir_path = os.path.dirname(path)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+
+    # write to a temporary file first so an interrupted build never leaves a truncated manifest
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(manifest, file, separators=(',', ':'), sort_keys=True)
+    os.replace(tmp_path, path)
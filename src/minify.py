@@ -0,0 +1,63 @@
+import re
+from typing import Iterable, Iterator, Optional, Pattern
+
+# the content of these elements is copied as it is
+PRESERVED_TAGS = ('pre', 'code', 'textarea', 'script', 'style')
+PRESERVED_TAG_PATTERN = re.compile(r'<(' + '|'.join(PRESERVED_TAGS) + r')\b', re.IGNORECASE)
+CLOSING_TAG_PATTERNS = {tag: re.compile(rf'</{tag}\s*>', re.IGNORECASE) for tag in PRESERVED_TAGS}
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+BETWEEN_TAGS_PATTERN = re.compile(r'>\s+<')
+
+
+class HTMLMinifier:
+    # Collapses whitespace in html fed to it chunk by chunk, keeping track of preserved
+    # elements and of trailing whitespace across chunks. between_tags also drops whitespace
+    # between two tags, which is only safe for layout markup such as the template, not for
+    # rendered content where '</b> <i>' is a real space.
+    def __init__(self, between_tags: bool = False, space: bool = True):
+        self.between_tags = between_tags
+        self.preserve: Optional[Pattern] = None
+        # the output so far ends in whitespace, or nothing was written yet
+        self.space = space
+
+    def feed(self, chunk: str) -> str:
+        parts = []
+        position = 0
+        while position < len(chunk):
+            if self.preserve is not None:
+                match = self.preserve.search(chunk, position)
+                if match is None:
+                    parts.append(chunk[position:])
+                    break
+                parts.append(chunk[position:match.end()])
+                position = match.end()
+                self.preserve = None
+                self.space = False
+                continue
+
+            match = PRESERVED_TAG_PATTERN.search(chunk, position)
+            end = len(chunk) if match is None else match.start()
+            parts.append(self.collapse(chunk[position:end]))
+            if match is not None:
+                self.preserve = CLOSING_TAG_PATTERNS[match.group(1).lower()]
+            position = end
+        return ''.join(parts)
+
+    def collapse(self, text: str) -> str:
+        if self.between_tags:
+            text = BETWEEN_TAGS_PATTERN.sub('><', text)
+        text = WHITESPACE_PATTERN.sub(' ', text)
+        if self.space and text.startswith(' '):
+            text = text[1:]
+        if text:
+            self.space = text.endswith(' ')
+        return text
+
+
+def iter_minified(chunks: Iterable[str], space: bool = True) -> Iterator[str]:
+    minifier = HTMLMinifier(space=space)
+    for chunk in chunks:
+        minified = minifier.feed(chunk)
+        if minified:
+            yield minified
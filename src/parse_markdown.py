@@ -1,9 +1,13 @@
+import mmap
+import os
 import re
 from enum import Enum
-from typing import List
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, NamedTuple, Optional, TextIO
 
+import profiling
 from htmlnode import HTMLNode, ParentNode, LeafNode
-from textnode import TextNode, TextType, text_node_to_html
+from render_cache import RenderCache
+from textnode import TextNode, TextType, text_node_to_html, text_nodes_to_html
 
 
 def split_nodes_delimiter(
@@ -14,7 +18,7 @@ def split_nodes_delimiter(
     new_nodes = []
 
     for node in old_nodes:
-        if node.text_type != TextType.TEXT.value:
+        if node.text_type is not TextType.TEXT:
             new_nodes.append(node)
         else:
             new_nodes.extend(split_single_node(node, delimiter))
@@ -43,78 +47,183 @@ def split_single_node(node: 'TextNode', delimiter: str) -> List['TextNode']:
             new_nodes.append(TextNode(block, text_type_dict[delimiter]))
     return new_nodes
 
-def split_nodes_image(old_nodes: List['TextNode']) -> List['TextNode']:
-    new_nodes = []
-    for node in old_nodes:
-        if node.text_type != TextType.TEXT.value:
-            new_nodes.append(node)
-        else:
-            images = extract_markdown_images(node.text)
-            if len(images) == 0:
-                new_nodes.append(node)
-            else:
-                text = node.text
-                for (alt_text, url) in images:
-                    split_text = text.split(f'![{alt_text}]({url})')
-                    if split_text[0] != '':
-                        new_nodes.append(TextNode(split_text[0], TextType.TEXT))
-                    new_nodes.append(TextNode(alt_text, TextType.IMAGE, url))
-                    split_text.pop(0)
-                    text = ''.join(split_text)
-                if text != '':
-                    new_nodes.append(TextNode(text, TextType.TEXT))
+IMAGE_PATTERN = re.compile(r'!\[([^\[\]]*)\]\(([^\(\)]*)\)')
+LINK_PATTERN = re.compile(r'(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)')
 
-    return new_nodes
+def split_nodes_image(old_nodes: List['TextNode']) -> List['TextNode']:
+    return split_nodes_pattern(old_nodes, IMAGE_PATTERN, TextType.IMAGE)
 
 
 def split_nodes_link(old_nodes: List['TextNode']) -> List['TextNode']:
+    return split_nodes_pattern(old_nodes, LINK_PATTERN, TextType.LINK)
+
+
+def split_nodes_pattern(old_nodes: List['TextNode'], pattern: re.Pattern, text_type: TextType) -> List['TextNode']:
     new_nodes = []
     for node in old_nodes:
-        if node.text_type != TextType.TEXT.value:
+        if node.text_type is not TextType.TEXT:
             new_nodes.append(node)
-        else:
-            links = extract_markdown_links(node.text)
-            if len(links) == 0:
-                new_nodes.append(node)
-            else:
-                text = node.text
-                for (alt_text, url) in links:
-                    split_text = text.split(f'[{alt_text}]({url})')
-                    if split_text[0] != '':
-                        new_nodes.append(TextNode(split_text[0], TextType.TEXT))
-                    new_nodes.append(TextNode(alt_text, TextType.LINK, url))
-                    split_text.pop(0)
-                    text = ''.join(split_text)
-                if text != '':
-                    new_nodes.append(TextNode(text, TextType.TEXT))
+            continue
+
+        text = node.text
+        start = 0
+        for match in pattern.finditer(text):
+            if start < match.start():
+                new_nodes.append(TextNode(text[start:match.start()], TextType.TEXT))
+            new_nodes.append(TextNode(match.group(1), text_type, match.group(2)))
+            start = match.end()
+
+        if start == 0:
+            new_nodes.append(node)
+        elif start < len(text):
+            new_nodes.append(TextNode(text[start:], TextType.TEXT))
 
     return new_nodes
 
 def extract_markdown_images(text: str) -> List[tuple]:
-    pattern = r'!\[([^\[\]]*)\]\(([^\(\)]*)\)'
-    matches = re.findall(pattern, text)
-    return matches
+    return IMAGE_PATTERN.findall(text)
 
 def extract_markdown_links(text: str) -> List[tuple]:
-    pattern = r'(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)'
-    matches = re.findall(pattern, text)
-    return matches
+    return LINK_PATTERN.findall(text)
+
+INLINE_TOKEN_PATTERN = re.compile(
+    r'\*\*|\*|`'
+    r'|!\[([^\[\]*`]*)\]\(([^\(\)*`]*)\)'
+    r'|(?<!!)\[([^\[\]*`]*)\]\(([^\(\)*`]*)\)'
+)
 
 def text_to_textnodes(text: str) -> List['TextNode']:
-    old_nodes = [TextNode(text, TextType.TEXT)]
-    bold_nodes = split_nodes_delimiter(old_nodes, '**', TextType.BOLD)
-    italic_nodes = split_nodes_delimiter(bold_nodes, '*', TextType.ITALIC)
-    code_nodes = split_nodes_delimiter(italic_nodes, '`', TextType.CODE)
-    image_nodes = split_nodes_image(code_nodes)
-    link_nodes = split_nodes_link(image_nodes)
-    return link_nodes
+    # called for every inline run, so not even a no-op stage when nothing is profiled
+    if profiling.active_profiler is None:
+        return tokenize_inline(text)
+    with profiling.stage('inline', len(text)):
+        return tokenize_inline(text)
+
+def tokenize_inline(text: str) -> List['TextNode']:
+    # Single walk over the text that yields the same nodes as chaining split_nodes_delimiter
+    # for '**', '*' and '`' followed by split_nodes_image and split_nodes_link: bold wins
+    # over italic, italic over code, and images and links are only recognized in plain text.
+    new_nodes: List['TextNode'] = []
+    text_type = TextType.TEXT
+    start = 0
+
+    for match in INLINE_TOKEN_PATTERN.finditer(text):
+        token = match.group()
+        if token == '**':
+            if text_type is TextType.ITALIC or text_type is TextType.CODE:
+                raise ValueError(f'Invalid Markdown syntax in text: {text}')
+            next_type = TextType.TEXT if text_type is TextType.BOLD else TextType.BOLD
+        elif token == '*':
+            if text_type is TextType.BOLD:
+                continue
+            if text_type is TextType.CODE:
+                raise ValueError(f'Invalid Markdown syntax in text: {text}')
+            next_type = TextType.TEXT if text_type is TextType.ITALIC else TextType.ITALIC
+        elif token == '`':
+            if text_type is TextType.BOLD or text_type is TextType.ITALIC:
+                continue
+            next_type = TextType.TEXT if text_type is TextType.CODE else TextType.CODE
+        else:
+            if text_type is not TextType.TEXT:
+                continue
+            next_type = TextType.TEXT
+
+        if start < match.start():
+            new_nodes.append(TextNode(text[start:match.start()], text_type))
+
+        if match.group(1) is not None:
+            new_nodes.append(TextNode(match.group(1), TextType.IMAGE, match.group(2)))
+        elif match.group(3) is not None:
+            new_nodes.append(TextNode(match.group(3), TextType.LINK, match.group(4)))
+
+        text_type = next_type
+        start = match.end()
+
+    if text_type is not TextType.TEXT:
+        raise ValueError(f'Invalid Markdown syntax in text: {text}')
+    if start < len(text):
+        new_nodes.append(TextNode(text[start:], TextType.TEXT))
+
+    return new_nodes
 
 def markdown_to_blocks(markdown: str) -> List[str]:
-    raw_blocks = markdown.split('\n\n')
-    filtered_blocks = filter(lambda block: block != '', raw_blocks)
-    trimmed_blocks = [block.strip() for block in filtered_blocks]
+    if profiling.active_profiler is None:
+        return list(iter_blocks(markdown.split('\n')))
+    with profiling.stage('blocks', len(markdown)):
+        return list(iter_blocks(markdown.split('\n')))
+
+def iter_lines(file: TextIO, chunk_size: int = 1 << 16) -> Iterator[str]:
+    remainder = ''
+    while chunk := file.read(chunk_size):
+        lines = (remainder + chunk).split('\n')
+        remainder = lines.pop()
+        yield from lines
+    yield remainder
+
+def iter_mapped_lines(path: str) -> Iterator[str]:
+    # Same lines as iter_lines, read from a memory map so only the current line is ever
+    # decoded. '\r\n' endings are dropped like text mode would.
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield ''
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            line = b''
+            for line in iter(mapped.readline, b''):
+                if line.endswith(b'\r\n'):
+                    yield line[:-2].decode()
+                elif line.endswith(b'\n'):
+                    yield line[:-1].decode()
+                else:
+                    yield line.decode()
+            if line.endswith(b'\n'):
+                yield ''
+
+def iter_blocks(lines: Iterable[str]) -> Iterator[str]:
+    # Blocks are separated by blank lines, except inside a ``` fence that opens a block,
+    # so code blocks may contain blank lines. Lines must not carry their trailing '\n'.
+    block_lines: List[str] = []
+    in_fence = False
 
-    return trimmed_blocks
+    for line in lines:
+        if in_fence:
+            block_lines.append(line)
+            if line.rstrip().endswith('```'):
+                in_fence = False
+        elif line.strip() == '':
+            if block_lines:
+                block = '\n'.join(block_lines).strip()
+                block_lines = []
+                if block:
+                    yield block
+        else:
+            if not block_lines and line.lstrip().startswith('```'):
+                fence = line.strip()
+                in_fence = len(fence) < 6 or not fence.endswith('```')
+            block_lines.append(line)
+
+    if in_fence:
+        # a fence that is never closed is not code, the rest of the document is split at
+        # blank lines as if the fence was not there
+        yield from iter_unfenced_blocks(block_lines)
+    elif block_lines:
+        block = '\n'.join(block_lines).strip()
+        if block:
+            yield block
+
+def iter_unfenced_blocks(lines: List[str]) -> Iterator[str]:
+    block_lines: List[str] = []
+    for line in lines + ['']:
+        if line.strip() != '':
+            block_lines.append(line)
+        elif block_lines:
+            block = '\n'.join(block_lines).strip()
+            block_lines = []
+            if block:
+                yield block
+
+def iter_markdown_blocks(file: TextIO, chunk_size: int = 1 << 16) -> Iterator[str]:
+    return iter_blocks(iter_lines(file, chunk_size))
 
 class BlockType(Enum):
     PARAGRAPH = 'paragraph'
@@ -126,88 +235,125 @@ class BlockType(Enum):
 
 
 def block_to_block_type(block: str) -> 'BlockType':
-    if is_heading_block(block):
-        return BlockType.HEADING
-    elif is_code_block(block):
-        return BlockType.CODE
-    elif is_quote_block(block):
-        return BlockType.QUOTE
-    elif is_unordered_list_block(block):
-        return BlockType.UNORDERED_LIST
-    elif is_ordered_list_block(block):
-        return BlockType.ORDERED_LIST
-    else:
-        return BlockType.PARAGRAPH
-
-
-def is_heading_block(block: str) -> bool:
+    return classify_block(block).block_type
+
+
+def is_heading_block(block: str, lines: Optional[List[str]] = None) -> bool:
     return block.startswith(('#', '##', '###', '####', '#####', '######'))
 
-def is_code_block(block: str) -> bool:
+def is_code_block(block: str, lines: Optional[List[str]] = None) -> bool:
     return block.startswith('```') and block.endswith('```')
 
-def is_quote_block(block: str) -> bool:
-    lines = block.split('\n')
+def is_quote_block(block: str, lines: Optional[List[str]] = None) -> bool:
+    if lines is None:
+        lines = block.split('\n')
     for line in lines:
         if not line.startswith('>'):
             return False
     return True
 
-def is_unordered_list_block(block: str) -> bool:
-    lines = block.split('\n')
+def is_unordered_list_block(block: str, lines: Optional[List[str]] = None) -> bool:
+    if lines is None:
+        lines = block.split('\n')
     for line in lines:
         if not line.startswith(('- ', '* ')):
             return False
     return True
 
-def is_ordered_list_block(block: str) -> bool:
-    lines = block.split('\n')
+def is_ordered_list_block(block: str, lines: Optional[List[str]] = None) -> bool:
+    if lines is None:
+        lines = block.split('\n')
     for index, line in enumerate(lines):
         if not line.startswith(f'{index + 1}.'):
             return False
     return True
 
-def markdown_to_html_node(markdown: str) -> 'HTMLNode':
+def markdown_to_html_node(markdown: str, cache: Optional[RenderCache] = None) -> 'HTMLNode':
     blocks = markdown_to_blocks(markdown)
     child_nodes = []
     for block in blocks:
-        block_type = block_to_block_type(block)
-        if block_type == BlockType.HEADING:
-            child_nodes.append(block_to_heading(block))
-        elif block_type == BlockType.CODE:
-            child_nodes.append(block_to_code(block))
-        elif block_type == BlockType.QUOTE:
-            child_nodes.append(block_to_quote(block))
-        elif block_type == BlockType.ORDERED_LIST:
-            child_nodes.append(block_to_ordered_list(block))
-        elif block_type == BlockType.UNORDERED_LIST:
-            child_nodes.append(block_to_unordered_list(block))
-        elif block_type == BlockType.PARAGRAPH:
-            child_nodes.append(block_to_paragraph(block))
+        if cache is None:
+            child_nodes.append(block_to_html_node(block))
         else:
-            raise ValueError(f'Unknown block type: {block_type}')
+            # a tagless leaf renders its value verbatim, so the cached fragment stands in for the block's subtree
+            child_nodes.append(LeafNode(None, cached_block_to_html(block, cache)))
 
     return ParentNode('div', child_nodes, None)
 
-def block_to_heading(block: str) -> 'HTMLNode':
+def markdown_to_html(markdown: str, cache: Optional[RenderCache] = None) -> str:
+    # same markup as markdown_to_html_node(markdown).to_html() without building the node tree
+    return ''.join(iter_markdown_html(markdown_to_blocks(markdown), cache))
+
+def iter_markdown_html(blocks: Iterable[str], cache: Optional[RenderCache] = None) -> Iterator[str]:
+    yield '<div>'
+    for block in blocks:
+        if cache is None:
+            yield block_to_html(block)
+        else:
+            yield cached_block_to_html(block, cache)
+    yield '</div>'
+
+def cached_block_to_html(block: str, cache: RenderCache) -> str:
+    key = cache.key('block', block)
+    html = cache.get(key)
+    if html is None:
+        html = block_to_html(block)
+        cache.put(key, html)
+    return html
+
+def block_to_html_node(block: str) -> 'HTMLNode':
+    return classify_block(block).to_html_node(block)
+
+def block_to_html(block: str) -> str:
+    rule = classify_block(block)
+    if rule.to_html is None:
+        return rule.to_html_node(block).to_html()
+    return rule.to_html(block)
+
+def inline_to_html(text: str) -> str:
+    return text_nodes_to_html(text_to_textnodes(text))
+
+def heading_level_and_text(block: str) -> tuple:
     split_block = block.split('#')
     heading_level = len(split_block) - 1
     text = str(split_block[-1]).strip()
+    return heading_level, text
+
+def quote_text(block: str) -> str:
+    lines = block.splitlines(True)
+    lines = map(lambda line: str(line).removeprefix('>').strip(), lines)
+    return ''.join(lines)
+
+def unordered_list_items(block: str) -> List[str]:
+    return [line[2:].strip() for line in block.splitlines(True)]
+
+def ordered_list_items(block: str) -> List[str]:
+    return [line.split('. ', 1)[1].strip() for line in block.splitlines(True)]
+
+def code_text(block: str) -> str:
+    return block.removeprefix('```').removesuffix('```').strip()
+
+def block_to_heading(block: str) -> 'HTMLNode':
+    heading_level, text = heading_level_and_text(block)
     return ParentNode(
         tag = f'h{heading_level}',
         children=[LeafNode(None, text, None)],
         props=None)
 
+def block_to_heading_html(block: str) -> str:
+    heading_level, text = heading_level_and_text(block)
+    return f'<h{heading_level}>{text}</h{heading_level}>'
+
 def block_to_quote(block: str) -> 'HTMLNode':
-    lines = block.splitlines(True)
-    lines = map(lambda line: str(line).removeprefix('>').strip(), lines)
-    text = ''.join(lines)
     return ParentNode(
         tag='blockquote',
-        children=list(map(lambda it: text_node_to_html(it), text_to_textnodes(text))),
+        children=list(map(lambda it: text_node_to_html(it), text_to_textnodes(quote_text(block)))),
         props=None,
     )
 
+def block_to_quote_html(block: str) -> str:
+    return f'<blockquote>{inline_to_html(quote_text(block))}</blockquote>'
+
 def block_to_unordered_list(block: str) -> 'HTMLNode':
     return ParentNode(
         tag='ul',
@@ -215,11 +361,15 @@ def block_to_unordered_list(block: str) -> 'HTMLNode':
             'li',
             children=list(map(
                 lambda it: text_node_to_html(it),
-                text_to_textnodes(line[2:].strip())))) for line in block.splitlines(True)
+                text_to_textnodes(item)))) for item in unordered_list_items(block)
         ],
         props=None
     )
 
+def block_to_unordered_list_html(block: str) -> str:
+    items = ''.join(f'<li>{inline_to_html(item)}</li>' for item in unordered_list_items(block))
+    return f'<ul>{items}</ul>'
+
 def block_to_ordered_list(block: str) -> 'HTMLNode':
     return ParentNode(
         tag='ol',
@@ -228,11 +378,15 @@ def block_to_ordered_list(block: str) -> 'HTMLNode':
                 'li',
                 children=list(map(
                     lambda it: text_node_to_html(it),
-                    text_to_textnodes(line.split('. ', 1)[1].strip())))) for line in block.splitlines(True)
+                    text_to_textnodes(item)))) for item in ordered_list_items(block)
         ],
         props=None
     )
 
+def block_to_ordered_list_html(block: str) -> str:
+    items = ''.join(f'<li>{inline_to_html(item)}</li>' for item in ordered_list_items(block))
+    return f'<ol>{items}</ol>'
+
 def block_to_code(block: str) -> 'HTMLNode':
     # <pre>
     #   <code>...
@@ -243,13 +397,16 @@ def block_to_code(block: str) -> 'HTMLNode':
         children=[
             LeafNode(
                 tag='code',
-                value=block.removeprefix('```').removesuffix('```').strip(),
+                value=code_text(block),
                 props=None
             )
         ],
         props=None
     )
 
+def block_to_code_html(block: str) -> str:
+    return f'<pre><code>{code_text(block)}</code></pre>'
+
 def block_to_paragraph(block: str) -> 'HTMLNode':
     return ParentNode(
         tag='p',
@@ -257,12 +414,59 @@ def block_to_paragraph(block: str) -> 'HTMLNode':
         props=None
     )
 
+def block_to_paragraph_html(block: str) -> str:
+    return f'<p>{inline_to_html(block)}</p>'
+
+class BlockRule(NamedTuple):
+    block_type: Hashable
+    matches: Callable[[str, List[str]], bool]
+    to_html_node: Callable[[str], 'HTMLNode']
+    to_html: Optional[Callable[[str], str]] = None
+
+
+PARAGRAPH_RULE = BlockRule(BlockType.PARAGRAPH, lambda block, lines: True, block_to_paragraph, block_to_paragraph_html)
+
+# first character of a block -> rules tried in order; blocks no rule matches are paragraphs
+BLOCK_RULES: Dict[str, List[BlockRule]] = {}
+
+
+def register_block_type(
+        block_type: Hashable,
+        first_chars: str,
+        matches: Callable[[str, List[str]], bool],
+        to_html_node: Callable[[str], 'HTMLNode'],
+        to_html: Optional[Callable[[str], str]] = None
+) -> None:
+    # to_html is an optional fast path that must produce the same markup as to_html_node(block).to_html()
+    rule = BlockRule(block_type, matches, to_html_node, to_html)
+    for char in first_chars:
+        # later registrations are tried first, so extensions can override the built-in rules
+        BLOCK_RULES.setdefault(char, []).insert(0, rule)
+
+
+def classify_block(block: str) -> BlockRule:
+    rules = BLOCK_RULES.get(block[:1])
+    if rules is not None:
+        lines = block.split('\n')
+        for rule in rules:
+            if rule.matches(block, lines):
+                return rule
+    return PARAGRAPH_RULE
+
+
+register_block_type(BlockType.HEADING, '#', is_heading_block, block_to_heading, block_to_heading_html)
+register_block_type(BlockType.CODE, '`', is_code_block, block_to_code, block_to_code_html)
+register_block_type(BlockType.QUOTE, '>', is_quote_block, block_to_quote, block_to_quote_html)
+register_block_type(
+    BlockType.UNORDERED_LIST, '-*', is_unordered_list_block, block_to_unordered_list, block_to_unordered_list_html)
+register_block_type(
+    BlockType.ORDERED_LIST, '1', is_ordered_list_block, block_to_ordered_list, block_to_ordered_list_html)
+
 def extract_title(markdown: str) -> str:
-    lines = markdown.splitlines(False)
+    return extract_title_from_lines(markdown.splitlines(False))
 
+def extract_title_from_lines(lines: Iterable[str]) -> str:
     for line in lines:
         if line.startswith('# '):
             return line.removeprefix('# ').strip()
     raise ValueError('No title found')
-
-
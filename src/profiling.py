@@ -0,0 +1,190 @@
+import json
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+class Stage:
+    __slots__ = ('profiler', 'name', 'bytes', 'started', 'nested')
+
+    def __init__(self, profiler: 'Profiler', name: str, nbytes: int):
+        self.profiler = profiler
+        self.name = name
+        self.bytes = nbytes
+        self.started = 0.0
+        # time spent in stages opened while this one was open
+        self.nested = 0.0
+
+    def __enter__(self) -> 'Stage':
+        self.profiler.open(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        elapsed = time.perf_counter() - self.started
+        self.profiler.close(elapsed)
+        self.profiler.add(self.name, elapsed, self.bytes, elapsed - self.nested)
+
+
+class NullStage:
+    __slots__ = ('bytes',)
+
+    def __enter__(self) -> 'NullStage':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+class PageTimer:
+    __slots__ = ('profiler', 'path', 'started')
+
+    def __init__(self, profiler: 'Profiler', path: str):
+        self.profiler = profiler
+        self.path = path
+        self.started = 0.0
+
+    def __enter__(self) -> 'PageTimer':
+        self.profiler.current_page = self.path
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.profiler.pages.setdefault(self.path, {})['total'] = time.perf_counter() - self.started
+        self.profiler.current_page = None
+
+
+class Profiler:
+    # Stages nest, inline parsing runs inside rendering for example, so next to its total
+    # time every stage keeps its self time, which leaves out the stages nested in it. Self
+    # times add up to the profiled time, totals do not. bytes is the file size for read and
+    # write, and the length of the text handled for the stages working in memory.
+    def __init__(self):
+        # stage name -> [seconds, bytes, calls, self seconds]
+        self.stages: Dict[str, List[float]] = {}
+        # page path -> stage name -> seconds, plus the page's 'total'
+        self.pages: Dict[str, Dict[str, float]] = {}
+        self.current_page: Optional[str] = None
+        self.open_stages: List[Stage] = []
+
+    def stage(self, name: str, nbytes: int = 0) -> Stage:
+        return Stage(self, name, nbytes)
+
+    def page(self, path: str) -> PageTimer:
+        return PageTimer(self, path)
+
+    def iter_stage(self, name: str, chunks: Iterable[str]) -> Iterator[str]:
+        # times a lazily produced stream, only while the next chunk is being made, and
+        # records it as a single call once the stream is exhausted
+        stage = Stage(self, name, 0)
+        seconds = self_seconds = 0.0
+        iterator = iter(chunks)
+        while True:
+            stage.nested = 0.0
+            self.open(stage)
+            started = time.perf_counter()
+            try:
+                chunk = next(iterator, None)
+            finally:
+                elapsed = time.perf_counter() - started
+                self.close(elapsed)
+                seconds += elapsed
+                self_seconds += elapsed - stage.nested
+            if chunk is None:
+                break
+            stage.bytes += len(chunk)
+            yield chunk
+        self.add(name, seconds, stage.bytes, self_seconds)
+
+    def open(self, stage: Stage) -> None:
+        self.open_stages.append(stage)
+
+    def close(self, seconds: float) -> None:
+        self.open_stages.pop()
+        if self.open_stages:
+            self.open_stages[-1].nested += seconds
+
+    def add(self, name: str, seconds: float, nbytes: int = 0, self_seconds: Optional[float] = None) -> None:
+        totals = self.stages.get(name)
+        if totals is None:
+            totals = self.stages[name] = [0.0, 0, 0, 0.0]
+        totals[0] += seconds
+        totals[1] += nbytes
+        totals[2] += 1
+        totals[3] += seconds if self_seconds is None else self_seconds
+        if self.current_page is not None:
+            page = self.pages.setdefault(self.current_page, {})
+            page[name] = page.get(name, 0.0) + seconds
+
+    def merge(self, other: 'Profiler') -> None:
+        for name, (seconds, nbytes, calls, self_seconds) in other.stages.items():
+            totals = self.stages.setdefault(name, [0.0, 0, 0, 0.0])
+            totals[0] += seconds
+            totals[1] += nbytes
+            totals[2] += calls
+            totals[3] += self_seconds
+        self.pages.update(other.pages)
+
+    def slowest_pages(self, top: int) -> List[tuple]:
+        pages = sorted(self.pages.items(), key=lambda item: item[1].get('total', 0.0), reverse=True)
+        return pages[:top]
+
+    def report(self, top: int = 10) -> dict:
+        return {
+            'stages': {
+                name: {'seconds': seconds, 'self_seconds': self_seconds, 'bytes': nbytes, 'calls': calls}
+                for name, (seconds, nbytes, calls, self_seconds) in self.stages.items()
+            },
+            'pages': len(self.pages),
+            'slowest_pages': [{'path': path, **stages} for path, stages in self.slowest_pages(top)],
+        }
+
+    def write_json(self, path: str, top: int = 10) -> None:
+        with open(path, 'w') as file:
+            json.dump(self.report(top), file, indent=2)
+
+    def summary(self, top: int = 10) -> str:
+        lines = [f'{"stage":<12} {"self":>10} {"total":>10} {"MB":>10} {"calls":>10}']
+        stages = sorted(self.stages.items(), key=lambda item: -item[1][3])
+        for name, (seconds, nbytes, calls, self_seconds) in stages:
+            lines.append(f'{name:<12} {self_seconds:>10.4f} {seconds:>10.4f} {nbytes / 1e6:>10.2f} {calls:>10}')
+        lines.append(f'{"all":<12} {sum(totals[3] for _, totals in stages):>10.4f}')
+        if self.pages:
+            lines.append('')
+            lines.append(f'slowest {min(top, len(self.pages))} of {len(self.pages)} pages')
+            for path, stages in self.slowest_pages(top):
+                lines.append(f'{stages.get("total", 0.0):>10.4f}s  {path}')
+        return '\n'.join(lines)
+
+
+NULL_STAGE = NullStage()
+
+active_profiler: Optional[Profiler] = None
+
+
+def enable() -> Profiler:
+    global active_profiler
+    active_profiler = Profiler()
+    return active_profiler
+
+
+def disable() -> None:
+    global active_profiler
+    active_profiler = None
+
+
+def stage(name: str, nbytes: int = 0):
+    if active_profiler is None:
+        return NULL_STAGE
+    return active_profiler.stage(name, nbytes)
+
+
+def iter_stage(name: str, chunks: Iterable[str]) -> Iterable[str]:
+    if active_profiler is None:
+        return chunks
+    return active_profiler.iter_stage(name, chunks)
+
+
+def page(path: str):
+    if active_profiler is None:
+        return NULL_STAGE
+    return active_profiler.page(path)
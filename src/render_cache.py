@@ -0,0 +1,73 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Optional
+
+# bump whenever a change to the renderer changes its output, so stale cache entries are ignored
+RENDERER_VERSION = '3'
+
+
+class RenderCache:
+    def __init__(self, max_entries: int = 100_000, max_size: int = 256 << 20, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.path = path
+        self.entries: OrderedDict[str, str] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        if path is not None:
+            self.load()
+
+    @staticmethod
+    def key(kind: str, markdown: str) -> str:
+        digest = hashlib.sha256(f'{RENDERER_VERSION}\0{kind}\0'.encode())
+        digest.update(markdown.encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        html = self.entries.get(key)
+        if html is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return html
+
+    def put(self, key: str, html: str) -> None:
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        if len(html) > self.max_size:
+            return
+        self.entries[key] = html
+        self.size += len(html)
+        while len(self.entries) > self.max_entries or self.size > self.max_size:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get('version') != RENDERER_VERSION:
+            return
+        # entries are stored least recently used first
+        for key, html in data['entries']:
+            self.put(key, html)
+
+    def save(self) -> None:
+        dir_path = os.path.dirname(self.path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump({'version': RENDERER_VERSION, 'entries': list(self.entries.items())}, file, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self.entries)
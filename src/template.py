@@ -0,0 +1,78 @@
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from minify import HTMLMinifier, iter_minified
+
+PLACEHOLDER_PATTERN = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+TemplateValue = Union[str, Iterable[str]]
+
+
+class Template:
+    def __init__(self, text: str, minify: bool = False):
+        # literals[i] is followed by slots[i]; there is always one more literal than slots
+        self.literals: List[str] = []
+        self.slots: List[str] = []
+        self.placeholders: List[str] = []
+
+        start = 0
+        for match in PLACEHOLDER_PATTERN.finditer(text):
+            self.literals.append(text[start:match.start()])
+            self.slots.append(match.group(1))
+            self.placeholders.append(match.group())
+            start = match.end()
+        self.literals.append(text[start:])
+
+        # whether the output before each slot ends in whitespace, for minifying its value;
+        # None leaves the value alone
+        self.slot_spaces: List[Optional[bool]] = [None] * len(self.slots)
+        if minify:
+            self.minify()
+
+    def minify(self) -> None:
+        # the literals are minified once here, so rendering only has to minify the values
+        minifier = HTMLMinifier(between_tags=True)
+        for index, literal in enumerate(self.literals):
+            self.literals[index] = minifier.feed(literal)
+            if index < len(self.slots):
+                if minifier.preserve is None:
+                    self.slot_spaces[index] = minifier.space
+                # nothing is known about the value, so the next literal keeps one leading space
+                minifier.space = False
+        if minifier.preserve is None:
+            self.literals[-1] = self.literals[-1].rstrip()
+
+    def iter_render(self, values: Dict[str, TemplateValue]) -> Iterator[str]:
+        for literal, slot, placeholder, space in zip(self.literals, self.slots, self.placeholders, self.slot_spaces):
+            if literal:
+                yield literal
+            value = values.get(slot)
+            if value is None:
+                # unknown placeholders are kept as they are
+                yield placeholder
+                continue
+            chunks = [value] if isinstance(value, str) else value
+            if space is not None:
+                chunks = iter_minified(chunks, space)
+            yield from chunks
+        if self.literals[-1]:
+            yield self.literals[-1]
+
+    def render(self, values: Dict[str, TemplateValue]) -> str:
+        return ''.join(self.iter_render(values))
+
+    def __repr__(self) -> str:
+        return f'Template({self.slots})'
+
+
+@lru_cache(maxsize=16)
+def compile_template(path: str, mtime_ns: int, size: int, minify: bool = False) -> Template:
+    with open(path) as file:
+        return Template(file.read(), minify)
+
+
+def load_template(path: str, minify: bool = False) -> Template:
+    stat = os.stat(path)
+    return compile_template(path, stat.st_mtime_ns, stat.st_size, minify)
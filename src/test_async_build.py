@@ -0,0 +1,79 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import async_build
+import handle_files
+from async_build import generate_page_recursive_async
+from handle_files import BuildError, generate_page_recursive
+from test_support import write
+
+
+def read_tree(root: str) -> dict:
+    outputs = {}
+    for dir_path, _, file_names in os.walk(root):
+        for file_name in file_names:
+            path = os.path.join(dir_path, file_name)
+            with open(path) as file:
+                outputs[os.path.relpath(path, root)] = file.read()
+    return outputs
+
+
+class TestGeneratePageRecursiveAsync(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, 'content')
+        self.template = os.path.join(self.root, 'template.html')
+        write(self.template, '<title>{{ Title }}</title>\n{{ Content }}\n')
+        for index in range(40):
+            write(
+                os.path.join(self.content, f'section{index % 3}', f'page{index}.md'),
+                f'# Page {index}\n\nSome **bold** and a [link](/{index}).\n\n- one\n- two')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_matchesSynchronousBuild(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_page_recursive(self.content, self.template, os.path.join(self.root, 'sync'))
+        generate_page_recursive_async(
+            self.content, self.template, os.path.join(self.root, 'async'), io_workers=4, queue_size=2)
+        expected = read_tree(os.path.join(self.root, 'sync'))
+        self.assertEqual(40, len(expected))
+        self.assertEqual(expected, read_tree(os.path.join(self.root, 'async')))
+
+    def test_processPoolRendering(self):
+        generate_page_recursive_async(self.content, self.template, os.path.join(self.root, 'async'), jobs=2)
+        self.assertEqual(40, len(read_tree(os.path.join(self.root, 'async'))))
+
+    def test_largePagesAreStreamed(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_page_recursive(self.content, self.template, os.path.join(self.root, 'sync'))
+
+        def read_markdown(path):
+            raise AssertionError(f'{path} was read whole')
+
+        threshold, read_whole = handle_files.STREAMING_THRESHOLD, async_build.read_markdown
+        handle_files.STREAMING_THRESHOLD, async_build.read_markdown = 0, read_markdown
+        try:
+            generate_page_recursive_async(self.content, self.template, os.path.join(self.root, 'async'))
+        finally:
+            handle_files.STREAMING_THRESHOLD, async_build.read_markdown = threshold, read_whole
+        self.assertEqual(read_tree(os.path.join(self.root, 'sync')), read_tree(os.path.join(self.root, 'async')))
+
+    def test_errorsAreCollectedPerPage(self):
+        write(os.path.join(self.content, 'section1', 'broken.md'), 'no title')
+        write(os.path.join(self.content, 'broken.md'), 'no title')
+        with self.assertRaises(BuildError) as context:
+            generate_page_recursive_async(self.content, self.template, os.path.join(self.root, 'async'))
+        self.assertEqual(
+            [os.path.join(self.content, 'broken.md'), os.path.join(self.content, 'section1', 'broken.md')],
+            list(context.exception.errors))
+        self.assertEqual(40, len(read_tree(os.path.join(self.root, 'async'))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,8 @@
 import unittest
 
-from src.htmlnode import HTMLNode, LeafNode, ParentNode
-from src.parse_markdown import block_to_heading, block_to_code, block_to_paragraph, block_to_quote, \
-    block_to_ordered_list, block_to_unordered_list, markdown_to_html_node
+from htmlnode import HTMLNode, LeafNode, ParentNode
+from parse_markdown import block_to_heading, block_to_code, block_to_paragraph, block_to_quote, \
+    block_to_ordered_list, block_to_unordered_list, markdown_to_html_node, markdown_to_html
 
 
 class TestBlockToHeading(unittest.TestCase):
@@ -291,5 +291,31 @@ And this is some text"""
         self.assertEqual(str(expected), str(node))
 
 
+class TestMarkdownToHTML(unittest.TestCase):
+    def test_matchesNodeTree(self):
+        markdown = """# This is the heading
+
+And this is **some** text with a [link](https://boot.dev)
+
+> A quote
+> with *two* lines
+
+```
+code with <tags>
+
+and a blank line
+```
+
+- One **1**
+- Two
+
+1. First ![image](a.png)
+2. Second"""
+        self.assertEqual(markdown_to_html_node(markdown).to_html(), markdown_to_html(markdown))
+
+    def test_emptyMarkdown(self):
+        self.assertEqual('<div></div>', markdown_to_html(''))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,102 @@
+import contextlib
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+
+from build_cache import BuildCache, cache_members
+from handle_files import generate_page_recursive
+from test_support import read, write
+
+
+class TestBuildCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.cache = BuildCache(os.path.join(self.root, 'cache'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_storeAndFetch(self):
+        page = os.path.join(self.root, 'page.html')
+        write(page, '<p>page</p>')
+        key = self.cache.key('markdown hash', 'template hash')
+        self.assertFalse(self.cache.fetch(key, os.path.join(self.root, 'out', 'page.html')))
+        self.cache.store(key, page)
+        self.assertTrue(self.cache.fetch(key, os.path.join(self.root, 'out', 'page.html')))
+        self.assertEqual('<p>page</p>', read(os.path.join(self.root, 'out', 'page.html')))
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+
+    def test_keyDependsOnTemplate(self):
+        self.assertNotEqual(self.cache.key('markdown', 'a'), self.cache.key('markdown', 'b'))
+
+    def test_pruneRemovesLeastRecentlyUsed(self):
+        page = os.path.join(self.root, 'page.html')
+        write(page, 'x' * 10)
+        keys = [self.cache.key(markdown_hash, 'template') for markdown_hash in ('a', 'b', 'c')]
+        for index, key in enumerate(keys):
+            self.cache.store(key, page)
+            os.utime(self.cache.entry_path(key), (index, index))
+        self.cache.fetch(keys[0], os.path.join(self.root, 'out.html'))
+
+        self.cache.max_size = 20
+        self.assertEqual(1, self.cache.prune())
+        self.assertFalse(os.path.exists(self.cache.entry_path(keys[1])))
+        self.assertTrue(os.path.exists(self.cache.entry_path(keys[0])))
+
+    def test_exportAndRestore(self):
+        page = os.path.join(self.root, 'page.html')
+        write(page, '<p>page</p>')
+        key = self.cache.key('markdown', 'template')
+        self.cache.store(key, page)
+        archive = os.path.join(self.root, 'cache.tar.gz')
+        self.cache.export(archive)
+
+        restored = BuildCache(os.path.join(self.root, 'restored'))
+        restored.restore(archive)
+        self.assertTrue(restored.fetch(key, os.path.join(self.root, 'out.html')))
+        self.assertEqual('<p>page</p>', read(os.path.join(self.root, 'out.html')))
+
+    def test_restoreSkipsForeignMembers(self):
+        page = os.path.join(self.root, 'page.html')
+        write(page, '<p>page</p>')
+        archive_path = os.path.join(self.root, 'cache.tar.gz')
+        with tarfile.open(archive_path, 'w:gz') as archive:
+            archive.add(page, arcname='ab/cdef')
+            archive.add(page, arcname='../escaped')
+            archive.add(page, arcname='ab/cd/nested')
+            link = tarfile.TarInfo('ab/link')
+            link.type = tarfile.SYMTYPE
+            link.linkname = '/etc/passwd'
+            archive.addfile(link)
+
+        with tarfile.open(archive_path) as archive:
+            self.assertEqual(['ab/cdef'], [member.name for member in cache_members(archive)])
+
+
+class TestGenerateWithBuildCache(unittest.TestCase):
+    def test_secondBuildOnlyRendersChangedPages(self):
+        with tempfile.TemporaryDirectory() as root:
+            content = os.path.join(root, 'content')
+            template = os.path.join(root, 'template.html')
+            write(os.path.join(content, 'index.md'), '# Home')
+            write(os.path.join(content, 'blog', 'post.md'), '# Post')
+            write(template, '{{ Content }}')
+            cache = BuildCache(os.path.join(root, 'cache'))
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_page_recursive(content, template, os.path.join(root, 'first'), build_cache=cache)
+            write(os.path.join(content, 'index.md'), '# New home')
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                generate_page_recursive(content, template, os.path.join(root, 'second'), build_cache=cache)
+
+            self.assertEqual(1, output.getvalue().count('Generating page'))
+            self.assertEqual((1, 3), (cache.hits, cache.misses))
+            self.assertEqual('<div><h1>Post</h1></div>', read(os.path.join(root, 'second', 'blog', 'post.html')))
+            self.assertEqual('<div><h1>New home</h1></div>', read(os.path.join(root, 'second', 'index.html')))
+
+
+if __name__ == '__main__':
+    unittest.main()
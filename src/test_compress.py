@@ -0,0 +1,108 @@
+import contextlib
+import gzip
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+
+from compress import brotli, compress_tree, is_compressed_up_to_date
+from handle_files import generate_site_incremental
+from test_support import read, write
+
+
+class TestCompressTree(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.public = self.tmp.name
+        self.page = os.path.join(self.public, 'blog', 'post.html')
+        write(self.page, '<p>' + 'compressible ' * 100 + '</p>')
+        write(os.path.join(self.public, 'index.css'), 'body {}')
+        write(os.path.join(self.public, 'image.png'), 'not really a png')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_writesGzipSiblings(self):
+        stats = compress_tree(self.public, ['gzip'])
+        self.assertEqual({'compressed': 2, 'unchanged': 0, 'deleted': 0}, stats)
+        with gzip.open(self.page + '.gz', 'rt') as file, open(self.page) as original:
+            self.assertEqual(original.read(), file.read())
+        self.assertFalse(os.path.exists(os.path.join(self.public, 'image.png.gz')))
+
+    def test_skipsUpToDateSiblings(self):
+        compress_tree(self.public, ['gzip'])
+        self.assertEqual({'compressed': 0, 'unchanged': 2, 'deleted': 0}, compress_tree(self.public, ['gzip']))
+
+        write(self.page, '<p>changed</p>')
+        os.utime(self.page, ns=(0, 0))
+        self.assertFalse(is_compressed_up_to_date(self.page, 'gzip'))
+        self.assertEqual(1, compress_tree(self.public, ['gzip'], jobs=2)['compressed'])
+        with gzip.open(self.page + '.gz', 'rt') as file:
+            self.assertEqual('<p>changed</p>', file.read())
+
+    def test_deletesOrphanedSiblings(self):
+        written = {}
+        compress_tree(self.public, ['gzip'], written=written)
+        self.assertEqual({self.page + '.gz': self.page, os.path.join(self.public, 'index.css.gz'): os.path.join(
+            self.public, 'index.css')}, written)
+        os.remove(self.page)
+        self.assertEqual(1, compress_tree(self.public, ['gzip'], written=written)['deleted'])
+        self.assertFalse(os.path.exists(self.page + '.gz'))
+        self.assertEqual([os.path.join(self.public, 'index.css.gz')], list(written))
+
+    def test_keepsCompressedAssetsItDidNotWrite(self):
+        root = os.path.join(self.tmp.name, 'site')
+        archive = os.path.join(root, 'static', 'downloads', 'data.tar.gz')
+        os.makedirs(os.path.dirname(archive))
+        with tarfile.open(archive, 'w:gz') as file:
+            file.add(self.page, arcname='post.html')
+        write(os.path.join(root, 'content', 'index.md'), '# Home')
+        write(os.path.join(root, 'template.html'), '{{ Content }}')
+
+        public = os.path.join(root, 'public')
+        written = {}
+        for _ in range(2):
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_site_incremental(
+                    os.path.join(root, 'static'), os.path.join(root, 'content'), os.path.join(root, 'template.html'),
+                    public, os.path.join(root, 'manifest.json'))
+            stats = compress_tree(public, ['gzip'], written=written)
+            self.assertEqual(0, stats['deleted'])
+        self.assertEqual({os.path.join(public, 'index.html.gz'): os.path.join(public, 'index.html')}, written)
+        with tarfile.open(os.path.join(public, 'downloads', 'data.tar.gz')) as file:
+            self.assertEqual(['post.html'], file.getnames())
+
+    def test_siblingsShippedAsStaticFilesAreLeftAlone(self):
+        static = os.path.join(self.tmp.name, 'static')
+        write(os.path.join(static, 'index.css.gz'), 'hand made')
+        write(os.path.join(self.public, 'index.css.gz'), 'hand made')
+        written = {}
+        stats = compress_tree(self.public, ['gzip'], written=written, static_dir=static)
+        self.assertEqual(1, stats['compressed'])
+        self.assertEqual('hand made', read(os.path.join(self.public, 'index.css.gz')))
+        self.assertEqual([self.page + '.gz'], list(written))
+
+        # a sibling written earlier that static/ starts shipping is handed over, not deleted
+        write(os.path.join(static, 'blog', 'post.html.gz'), 'hand made')
+        write(self.page + '.gz', 'hand made')
+        self.assertEqual(0, compress_tree(self.public, ['gzip'], written=written, static_dir=static)['deleted'])
+        self.assertEqual({}, written)
+        self.assertEqual('hand made', read(self.page + '.gz'))
+
+    def test_deletesSiblingsOfDroppedFormats(self):
+        written = {}
+        compress_tree(self.public, ['gzip'], written=written)
+        self.assertEqual(2, compress_tree(self.public, [], written=written)['deleted'])
+        self.assertFalse(os.path.exists(self.page + '.gz'))
+        self.assertEqual({}, written)
+
+    @unittest.skipIf(brotli is None, 'brotli is not installed')
+    def test_writesBrotliSiblings(self):
+        compress_tree(self.public, ['brotli'])
+        with open(self.page + '.br', 'rb') as file, open(self.page, 'rb') as original:
+            self.assertEqual(original.read(), brotli.decompress(file.read()))
+
+
+if __name__ == '__main__':
+    unittest.main()
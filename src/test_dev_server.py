@@ -0,0 +1,93 @@
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from dev_server import LazySite, make_server
+from test_support import write
+
+
+class TestLazySite(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, 'content')
+        self.template = os.path.join(self.root, 'template.html')
+        write(os.path.join(self.root, 'static', 'index.css'), 'body {}')
+        write(os.path.join(self.content, 'index.md'), '# Home')
+        write(os.path.join(self.content, 'blog', 'post.md'), '# Post')
+        write(self.template, '<title>{{ Title }}</title>{{ Content }}')
+        self.site = LazySite(os.path.join(self.root, 'static'), self.content, self.template)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_resolve(self):
+        self.assertEqual(('page', os.path.join(self.content, 'index.md')), self.site.resolve('/'))
+        self.assertEqual(('page', os.path.join(self.content, 'blog', 'post.md')), self.site.resolve('/blog/post.html'))
+        self.assertEqual(('static', os.path.join(self.root, 'static', 'index.css')), self.site.resolve('/index.css'))
+        self.assertIsNone(self.site.resolve('/missing.html'))
+        self.assertIsNone(self.site.resolve('/../template.html'))
+
+    def test_directoryWithoutSlashRedirects(self):
+        write(os.path.join(self.content, 'blog', 'index.md'), '# Blog')
+        self.assertEqual(('redirect', '/blog/'), self.site.resolve('/blog'))
+        self.assertEqual(('page', os.path.join(self.content, 'blog', 'index.md')), self.site.resolve('/blog/'))
+        # no index to redirect to
+        os.makedirs(os.path.join(self.root, 'static', 'images'))
+        self.assertIsNone(self.site.resolve('/images'))
+
+    def test_renderIsCachedUntilSourceChanges(self):
+        path = os.path.join(self.content, 'index.md')
+        page = self.site.render(path)
+        self.assertEqual(b'<title>Home</title><div><h1>Home</h1></div>', page)
+        self.assertIs(page, self.site.render(path))
+
+        write(path, '# Changed')
+        os.utime(path, ns=(0, 0))
+        self.assertEqual(b'<title>Changed</title><div><h1>Changed</h1></div>', self.site.render(path))
+
+    def test_leastRecentlyServedPagesAreDropped(self):
+        index, post = os.path.join(self.content, 'index.md'), os.path.join(self.content, 'blog', 'post.md')
+        page_size = len(self.site.render(index))
+        self.site.max_size = 2 * page_size
+        self.site.render(post)
+        self.site.render(index)
+        write(os.path.join(self.content, 'other.md'), '# Else')
+        self.site.render(os.path.join(self.content, 'other.md'))
+        self.assertEqual([index, os.path.join(self.content, 'other.md')], list(self.site.pages))
+        self.assertLessEqual(self.site.size, self.site.max_size)
+
+    def test_serve(self):
+        server = make_server(self.site, '127.0.0.1', 0)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        base = f'http://127.0.0.1:{server.server_address[1]}'
+        # the handler logs every request to stderr
+        try:
+            with contextlib.redirect_stderr(io.StringIO()):
+                with urllib.request.urlopen(f'{base}/blog/post.html') as response:
+                    self.assertEqual('text/html; charset=utf-8', response.headers['Content-Type'])
+                    self.assertEqual(b'<title>Post</title><div><h1>Post</h1></div>', response.read())
+                with urllib.request.urlopen(f'{base}/index.css') as response:
+                    self.assertEqual(b'body {}', response.read())
+                write(os.path.join(self.content, 'blog', 'index.md'), '# Blog')
+                with urllib.request.urlopen(f'{base}/blog?page=2') as response:
+                    self.assertEqual(f'{base}/blog/?page=2', response.url)
+                    self.assertEqual(b'<title>Blog</title><div><h1>Blog</h1></div>', response.read())
+                with self.assertRaises(urllib.error.HTTPError) as context:
+                    urllib.request.urlopen(f'{base}/missing.html')
+                self.assertEqual(404, context.exception.code)
+                context.exception.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
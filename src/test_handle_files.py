@@ -0,0 +1,369 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import handle_files
+from handle_files import BuildError, ShardCollisionError, collect_files, generate_page_recursive, \
+    generate_site_incremental, merge_shards, shard_of, sync_files
+from render_cache import RenderCache
+from test_support import read, write
+
+
+class TestGenerateSiteIncremental(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.static = os.path.join(self.root, 'static')
+        self.content = os.path.join(self.root, 'content')
+        self.template = os.path.join(self.root, 'template.html')
+        self.public = os.path.join(self.root, 'public')
+        self.manifest = os.path.join(self.root, 'manifest.json')
+        write(os.path.join(self.static, 'index.css'), 'body {}')
+        write(os.path.join(self.content, 'index.md'), '# Home\n\nWelcome')
+        write(os.path.join(self.content, 'blog', 'post.md'), '# Post\n\nSome **bold** text')
+        write(self.template, '<title>{{ Title }}</title>{{ Content }}')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self) -> dict:
+        return generate_site_incremental(self.static, self.content, self.template, self.public, self.manifest)
+
+    def test_firstBuildGeneratesEverything(self):
+        stats = self.build()
+        self.assertEqual({'generated': 2, 'copied': 1, 'deleted': 0, 'unchanged': 0}, stats)
+        self.assertEqual(
+            '<title>Post</title><div><h1>Post</h1><p>Some <b>bold</b> text</p></div>',
+            read(os.path.join(self.public, 'blog', 'post.html')))
+
+    def test_secondBuildIsNoOp(self):
+        self.build()
+        stats = self.build()
+        self.assertEqual({'generated': 0, 'copied': 0, 'deleted': 0, 'unchanged': 3}, stats)
+
+    def test_onlyChangedPageIsRegenerated(self):
+        self.build()
+        write(os.path.join(self.content, 'index.md'), '# Home\n\nWelcome back')
+        stats = self.build()
+        self.assertEqual(1, stats['generated'])
+        self.assertIn('Welcome back', read(os.path.join(self.public, 'index.html')))
+
+    def test_templateChangeRegeneratesAllPages(self):
+        self.build()
+        write(self.template, '<h>{{ Title }}</h>{{ Content }}')
+        stats = self.build()
+        self.assertEqual(2, stats['generated'])
+        self.assertEqual(0, stats['copied'])
+
+    def test_unchangedAssetsAreNotHashedAgain(self):
+        self.build()
+        hashed = []
+        original = handle_files.hash_file
+        handle_files.hash_file = lambda path: hashed.append(path) or original(path)
+        try:
+            self.build()
+            self.assertNotIn(os.path.join(self.static, 'index.css'), hashed)
+            # touched but not changed: hashed once, not copied
+            os.utime(os.path.join(self.static, 'index.css'), ns=(0, 0))
+            stats = self.build()
+            self.assertIn(os.path.join(self.static, 'index.css'), hashed)
+            self.assertEqual(0, stats['copied'])
+        finally:
+            handle_files.hash_file = original
+
+    @unittest.skipUnless(hasattr(os, 'link'), 'needs hardlinks')
+    def test_hardLinkedAssets(self):
+        generate_site_incremental(self.static, self.content, self.template, self.public, self.manifest, link='hard')
+        self.assertTrue(os.path.samefile(os.path.join(self.static, 'index.css'), os.path.join(self.public, 'index.css')))
+
+    def test_removedSourcesAreDeleted(self):
+        self.build()
+        os.remove(os.path.join(self.content, 'blog', 'post.md'))
+        os.remove(os.path.join(self.static, 'index.css'))
+        stats = self.build()
+        self.assertEqual(2, stats['deleted'])
+        self.assertFalse(os.path.exists(os.path.join(self.public, 'blog', 'post.html')))
+        self.assertFalse(os.path.exists(os.path.join(self.public, 'index.css')))
+
+
+class TestGeneratePageRecursive(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, 'content')
+        self.template = os.path.join(self.root, 'template.html')
+        write(self.template, '<title>{{ Title }}</title>{{ Content }}')
+        for index in range(6):
+            write(os.path.join(self.content, f'section{index % 2}', f'page{index}.md'), f'# Page {index}\n\nText {index}')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, dest: str, jobs: int) -> dict:
+        generate_page_recursive(self.content, self.template, dest, jobs=jobs)
+        outputs = {}
+        for dir_path, _, file_names in os.walk(dest):
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+                outputs[os.path.relpath(path, dest)] = read(path)
+        return outputs
+
+    def test_parallelOutputMatchesSerial(self):
+        serial = self.build(os.path.join(self.root, 'serial'), jobs=1)
+        parallel = self.build(os.path.join(self.root, 'parallel'), jobs=3)
+        self.assertEqual(6, len(serial))
+        self.assertEqual(serial, parallel)
+
+    def test_failedPageLeavesNoPartialOutput(self):
+        write(os.path.join(self.content, 'bad.md'), '# Bad\n\nfine para\n\nthis is **unclosed')
+        for jobs in (1, 2):
+            dest = os.path.join(self.root, f'public{jobs}')
+            with self.assertRaises(BuildError):
+                self.build(dest, jobs=jobs)
+            self.assertFalse(os.path.exists(os.path.join(dest, 'bad.html')))
+            self.assertFalse(os.path.exists(os.path.join(dest, 'bad.html.tmp')))
+
+        # the output of the last good render stays in place
+        write(os.path.join(dest, 'bad.html'), 'previous')
+        with self.assertRaises(BuildError):
+            self.build(dest, jobs=1)
+        self.assertEqual('previous', read(os.path.join(dest, 'bad.html')))
+
+        threshold = handle_files.STREAMING_THRESHOLD
+        handle_files.STREAMING_THRESHOLD = 0
+        try:
+            with self.assertRaises(ValueError):
+                handle_files.generate_page(
+                    os.path.join(self.content, 'bad.md'), self.template, os.path.join(self.root, 'streamed.html'))
+        finally:
+            handle_files.STREAMING_THRESHOLD = threshold
+        self.assertEqual([], [name for name in os.listdir(self.root) if name.startswith('streamed')])
+
+    def test_parallelErrorsAreCollectedPerPage(self):
+        write(os.path.join(self.content, 'broken.md'), 'no title here')
+        write(os.path.join(self.content, 'section1', 'broken.md'), 'no title either')
+        with self.assertRaises(BuildError) as context:
+            self.build(os.path.join(self.root, 'parallel'), jobs=2)
+        self.assertEqual(
+            [os.path.join(self.content, 'broken.md'), os.path.join(self.content, 'section1', 'broken.md')],
+            list(context.exception.errors))
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'parallel', 'section0', 'page0.html')))
+
+
+class TestCollectFiles(unittest.TestCase):
+    def test_sortedDepthFirstPlan(self):
+        with tempfile.TemporaryDirectory() as root:
+            for path in ('b.txt', 'a/z.txt', 'a/b/c.txt', 'c/d.txt', 'a.txt'):
+                write(os.path.join(root, 'src', path), path)
+            plan = collect_files(os.path.join(root, 'src'), 'out')
+            expected = ['a/b/c.txt', 'a/z.txt', 'a.txt', 'b.txt', 'c/d.txt']
+            self.assertEqual([os.path.join(root, 'src', path) for path in expected], [source for source, _ in plan])
+            self.assertEqual([os.path.join('out', path) for path in expected], [dest for _, dest in plan])
+
+    @unittest.skipUnless(hasattr(os, 'symlink') and os.name == 'posix', 'needs symlinks')
+    def test_symlinkCyclesAreNotFollowed(self):
+        with tempfile.TemporaryDirectory() as root:
+            write(os.path.join(root, 'src', 'a', 'file.txt'), 'file')
+            write(os.path.join(root, 'shared', 'logo.svg'), 'logo')
+            os.symlink(os.path.join(root, 'src'), os.path.join(root, 'src', 'a', 'loop'))
+            os.symlink(os.path.join(root, 'shared'), os.path.join(root, 'src', 'shared'))
+            plan = collect_files(os.path.join(root, 'src'), 'out')
+            self.assertEqual(
+                [os.path.join('out', 'a', 'file.txt'), os.path.join('out', 'shared', 'logo.svg')],
+                [dest for _, dest in plan])
+
+
+class TestShardedBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, 'content')
+        self.template = os.path.join(self.root, 'template.html')
+        for index in range(12):
+            write(os.path.join(self.content, f'section{index % 3}', f'page{index}.md'), f'# Page {index}')
+        write(self.template, '{{ Content }}')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_shardOfIsStable(self):
+        self.assertEqual(shard_of('blog/post.md', 7), shard_of(os.path.join('blog', 'post.md'), 7))
+        self.assertEqual({0, 1, 2}, {shard_of(f'page{index}.md', 3) for index in range(30)})
+
+    def test_mergedShardsMatchFullBuild(self):
+        shard_dirs = [os.path.join(self.root, 'shards', str(index)) for index in range(3)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_page_recursive(self.content, self.template, os.path.join(self.root, 'full'))
+            for index, shard_dir in enumerate(shard_dirs):
+                generate_page_recursive(self.content, self.template, shard_dir, shard=(index, 3))
+
+        self.assertTrue(all(os.listdir(shard_dir) for shard_dir in shard_dirs))
+        merged = os.path.join(self.root, 'merged')
+        self.assertEqual(12, merge_shards(shard_dirs, merged))
+        for index in range(12):
+            path = os.path.join(f'section{index % 3}', f'page{index}.html')
+            self.assertEqual(read(os.path.join(self.root, 'full', path)), read(os.path.join(merged, path)))
+
+    def test_collisionsAreRejected(self):
+        write(os.path.join(self.root, 'a', 'index.html'), 'a')
+        write(os.path.join(self.root, 'b', 'index.html'), 'b')
+        write(os.path.join(self.root, 'b', 'other.html'), 'b')
+        merged = os.path.join(self.root, 'merged')
+        with self.assertRaises(ShardCollisionError) as context:
+            merge_shards([os.path.join(self.root, 'a'), os.path.join(self.root, 'b')], merged)
+        self.assertEqual(['index.html'], list(context.exception.collisions))
+        self.assertFalse(os.path.exists(merged))
+
+    def test_collisionsWithStaticFilesAreRejected(self):
+        write(os.path.join(self.root, 'static', 'about.html'), 'static')
+        write(os.path.join(self.root, 'a', 'about.html'), 'page')
+        write(os.path.join(self.root, 'a', 'index.html'), 'page')
+        merged = os.path.join(self.root, 'merged')
+        with self.assertRaises(ShardCollisionError) as context:
+            merge_shards([os.path.join(self.root, 'a')], merged, os.path.join(self.root, 'static'))
+        self.assertEqual(
+            {'about.html': [os.path.join(self.root, 'static'), os.path.join(self.root, 'a')]},
+            context.exception.collisions)
+        self.assertFalse(os.path.exists(merged))
+
+
+class TestGeneratePageStreaming(unittest.TestCase):
+    def test_streamingOutputMatches(self):
+        markdown = '# Big page\n\n' + '\n\n'.join(
+            f'Paragraph {index} with **bold** and a [link](/{index}).\n\n```\ncode {index}\n\nmore\n```\n\n- item\n- item'
+            for index in range(200))
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'page.md')
+            template = os.path.join(tmp, 'template.html')
+            write(source, markdown)
+            write(template, '<title>{{ Title }}</title>\n<main>{{ Content }}</main>\n')
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                handle_files.generate_page(source, template, os.path.join(tmp, 'whole.html'))
+                threshold = handle_files.STREAMING_THRESHOLD
+                handle_files.STREAMING_THRESHOLD = 0
+                try:
+                    handle_files.generate_page(source, template, os.path.join(tmp, 'streamed.html'))
+                finally:
+                    handle_files.STREAMING_THRESHOLD = threshold
+
+            whole = read(os.path.join(tmp, 'whole.html'))
+            self.assertTrue(whole.startswith('<title>Big page</title>'))
+            self.assertEqual(whole, read(os.path.join(tmp, 'streamed.html')))
+
+    def test_streamingUsesRenderCache(self):
+        markdown = '# Page\n\n' + '\n\n'.join(f'Paragraph {index}' for index in range(10))
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'page.md')
+            template = os.path.join(tmp, 'template.html')
+            write(source, markdown)
+            write(template, '{{ Content }}')
+            cache = RenderCache()
+
+            threshold = handle_files.STREAMING_THRESHOLD
+            handle_files.STREAMING_THRESHOLD = 0
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    handle_files.generate_page(source, template, os.path.join(tmp, 'first.html'), cache)
+                    handle_files.generate_page(source, template, os.path.join(tmp, 'second.html'), cache)
+            finally:
+                handle_files.STREAMING_THRESHOLD = threshold
+
+            self.assertEqual((11, 11), (cache.hits, cache.misses))
+            self.assertEqual(read(os.path.join(tmp, 'first.html')), read(os.path.join(tmp, 'second.html')))
+
+    def test_minifiedStreamingOutputMatches(self):
+        markdown = '# Page\n\nSome\ntext with **bold** *and*   italic\n\n```\ncode\n\n    indented   code\n```'
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'page.md')
+            template = os.path.join(tmp, 'template.html')
+            write(source, markdown)
+            write(template, '<html>\n  <title>{{ Title }}</title>\n  <main>\n    {{ Content }}\n  </main>\n</html>\n')
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                handle_files.generate_page(source, template, os.path.join(tmp, 'whole.html'), minify=True)
+                threshold = handle_files.STREAMING_THRESHOLD
+                handle_files.STREAMING_THRESHOLD = 0
+                try:
+                    handle_files.generate_page(source, template, os.path.join(tmp, 'streamed.html'), minify=True)
+                finally:
+                    handle_files.STREAMING_THRESHOLD = threshold
+
+            whole = read(os.path.join(tmp, 'whole.html'))
+            self.assertEqual(
+                '<html><title>Page</title><main> <div><h1>Page</h1><p>Some text with <b>bold</b> <i>and</i> italic</p>'
+                '<pre><code>code\n\n    indented   code</code></pre></div> </main></html>',
+                whole)
+            self.assertEqual(whole, read(os.path.join(tmp, 'streamed.html')))
+
+
+class TestSyncFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, 'static')
+        self.public = os.path.join(self.tmp.name, 'public')
+        write(os.path.join(self.static, 'index.css'), 'body {}')
+        write(os.path.join(self.static, 'images', 'logo.svg'), '<svg/>')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_copiesOnlyChangedFiles(self):
+        self.assertEqual({'copied': 2, 'unchanged': 0, 'deleted': 0}, sync_files(self.static, self.public))
+        self.assertEqual({'copied': 0, 'unchanged': 2, 'deleted': 0}, sync_files(self.static, self.public))
+
+        write(os.path.join(self.static, 'index.css'), 'body { margin: 0 }')
+        self.assertEqual({'copied': 1, 'unchanged': 1, 'deleted': 0}, sync_files(self.static, self.public))
+        self.assertEqual('body { margin: 0 }', read(os.path.join(self.public, 'index.css')))
+
+    def test_hashCompareIgnoresTouchedFiles(self):
+        sync_files(self.static, self.public, compare='hash')
+        os.utime(os.path.join(self.static, 'index.css'), ns=(0, 0))
+        self.assertEqual({'copied': 0, 'unchanged': 2, 'deleted': 0}, sync_files(self.static, self.public, compare='hash'))
+
+    def test_hashCompareReadsOnlyChangedSources(self):
+        hashes = {}
+        sync_files(self.static, self.public, compare='hash', hashes=hashes)
+        self.assertEqual({os.path.join(self.static, 'index.css'), os.path.join(self.static, 'images', 'logo.svg')}, set(hashes))
+
+        hashed = []
+        original = handle_files.hash_file
+        handle_files.hash_file = lambda path: hashed.append(path) or original(path)
+        try:
+            os.utime(os.path.join(self.static, 'index.css'), ns=(0, 0))
+            stats = sync_files(self.static, self.public, compare='hash', hashes=hashes)
+            self.assertEqual({'copied': 0, 'unchanged': 2, 'deleted': 0}, stats)
+            self.assertEqual([os.path.join(self.static, 'index.css')], hashed)
+
+            hashed.clear()
+            self.assertEqual(2, sync_files(self.static, self.public, compare='hash', hashes=hashes)['unchanged'])
+            self.assertEqual([], hashed)
+        finally:
+            handle_files.hash_file = original
+
+        write(os.path.join(self.static, 'index.css'), 'body { margin: 0 }')
+        self.assertEqual(1, sync_files(self.static, self.public, compare='hash', hashes=hashes)['copied'])
+        self.assertEqual('body { margin: 0 }', read(os.path.join(self.public, 'index.css')))
+
+    def test_deletesStaleOutputsExceptKept(self):
+        write(os.path.join(self.public, 'old', 'stale.js'), '')
+        write(os.path.join(self.public, 'index.html'), '<p>page</p>')
+        stats = sync_files(self.static, self.public, keep={os.path.join(self.public, 'index.html')})
+        self.assertEqual(1, stats['deleted'])
+        self.assertFalse(os.path.exists(os.path.join(self.public, 'old')))
+        self.assertTrue(os.path.exists(os.path.join(self.public, 'index.html')))
+
+    def test_hardLinks(self):
+        sync_files(self.static, self.public, link='hard')
+        self.assertTrue(os.path.samefile(os.path.join(self.static, 'index.css'), os.path.join(self.public, 'index.css')))
+        self.assertEqual({'copied': 0, 'unchanged': 2, 'deleted': 0}, sync_files(self.static, self.public, link='hard'))
+
+    def test_reflinkFallsBackToCopy(self):
+        sync_files(self.static, self.public, link='reflink')
+        self.assertEqual('<svg/>', read(os.path.join(self.public, 'images', 'logo.svg')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,6 @@
 import unittest
 
-from src.htmlnode import HTMLNode
+from htmlnode import HTMLNode, LeafNode, ParentNode
 
 
 class TestHTMLNode(unittest.TestCase):
@@ -17,6 +17,10 @@ class TestHTMLNode(unittest.TestCase):
         node = HTMLNode()
         self.assertIsNone(node.tag)
 
+    def test_HTMLNode_hasNoInstanceDict(self):
+        for node in (HTMLNode('p'), LeafNode('b', 'text'), ParentNode('p', [])):
+            self.assertFalse(hasattr(node, '__dict__'))
+
 
 if __name__ == '__main__':
     unittest.main()
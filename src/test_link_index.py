@@ -0,0 +1,119 @@
+import os
+import tempfile
+import unittest
+
+from handle_files import BuildError, generate_site_incremental
+from link_index import LinkIndex, extract_page_links, resolve_link, update_link_index
+from test_support import write
+
+
+class TestResolveLink(unittest.TestCase):
+    def test_relativeAndAbsolute(self):
+        self.assertEqual('/blog/other.html', resolve_link('/blog/post.html', 'other.html'))
+        self.assertEqual('/index.html', resolve_link('/blog/post.html', '../index.html'))
+        self.assertEqual('/blog/index.html', resolve_link('/index.html', '/blog/'))
+        self.assertEqual('/about.html', resolve_link('/index.html', '/about.html#team'))
+
+    def test_externalLinksAndAnchors(self):
+        self.assertIsNone(resolve_link('/index.html', 'https://example.com/'))
+        self.assertIsNone(resolve_link('/index.html', '#top'))
+
+
+class TestLinkIndex(unittest.TestCase):
+    def test_extractSkipsCodeBlocks(self):
+        markdown = '[a](/a.html) and ![img](/img.png)\n\n```\n[b](/b.html)\n```'
+        self.assertEqual((['/a.html'], ['/img.png']), extract_page_links(markdown))
+
+    def test_extractSkipsInlineCode(self):
+        markdown = 'See `[b](/b.html)` and [a](/a.html)\n\n* [c](/c.html)\n* `![d](/d.png)`\n\n> ![e](/e.png)'
+        self.assertEqual((['/a.html', '/c.html'], ['/e.png']), extract_page_links(markdown))
+
+    def test_updateUsesExtractedLinks(self):
+        index = LinkIndex()
+        pages = {'/nowhere/index.md': {'hash': 'x', 'dest': '/public/index.html'}}
+        # the content file does not exist, so it must not be read again
+        update_link_index(index, {}, pages, {'/nowhere/index.md': (['/a.html'], [])}, '/public')
+        self.assertEqual({'/index.html': (['/a.html'], [])}, index.pages)
+
+    def test_backlinksAndBrokenLinks(self):
+        index = LinkIndex()
+        index.update('/index.html', ['/blog/post.html', '/missing.html'], ['/logo.png'])
+        index.update('/blog/post.html', ['../index.html', 'https://example.com'], [])
+        self.assertEqual(['/index.html'], index.backlinks('/blog/post.html'))
+        self.assertEqual({'/index.html'}, index.dependents({'/missing.html'}))
+        self.assertEqual(
+            {'/index.html': ['/missing.html', '/logo.png']},
+            index.broken_links({'/index.html', '/blog/post.html'}))
+
+    def test_saveAndLoad(self):
+        index = LinkIndex()
+        index.update('/index.html', ['/a.html', '/b.html'], ['/a.html'])
+        index.update('/a.html', ['/b.html'], [])
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'index')
+            index.save(path)
+            self.assertEqual(index.pages, LinkIndex.load(path).pages)
+
+    def test_loadIgnoresCorruptIndex(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'index')
+            write(path, 'not an index')
+            self.assertEqual({}, LinkIndex.load(path).pages)
+
+
+class TestIncrementalDependents(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, 'content')
+        self.template = os.path.join(self.root, 'template.html')
+        write(os.path.join(self.root, 'static', 'index.css'), 'body {}')
+        write(os.path.join(self.content, 'index.md'), '# Home\n\n[About](/about.html)')
+        write(os.path.join(self.content, 'blog.md'), '# Blog\n\nNo links')
+        write(self.template, '{{ Content }}')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self) -> dict:
+        return generate_site_incremental(
+            os.path.join(self.root, 'static'), self.content, self.template, os.path.join(self.root, 'public'),
+            os.path.join(self.root, 'manifest.json'), link_index_path=os.path.join(self.root, 'links'))
+
+    def test_addedTargetRebuildsLinkingPages(self):
+        self.build()
+        write(os.path.join(self.content, 'about.md'), '# About')
+        stats = self.build()
+        # the new page and the page linking to it, but not the unrelated blog page
+        self.assertEqual(2, stats['generated'])
+        self.assertEqual(2, stats['unchanged'])
+
+    def test_malformedPageFailsOnItsOwn(self):
+        write(os.path.join(self.content, 'about.md'), '# About\n\nthis is **unclosed')
+        with open(os.path.join(self.content, 'latin.md'), 'wb') as file:
+            file.write('# Caf\u00e9'.encode('latin-1'))
+        with self.assertRaises(BuildError) as context:
+            self.build()
+        self.assertEqual(
+            {os.path.join(self.content, 'about.md'), os.path.join(self.content, 'latin.md')},
+            set(context.exception.errors))
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'public', 'index.html')))
+        self.assertIn('/index.html', LinkIndex.load(os.path.join(self.root, 'links')).pages)
+
+        # the failed pages are retried once fixed
+        write(os.path.join(self.content, 'about.md'), '# About')
+        write(os.path.join(self.content, 'latin.md'), '# Latin')
+        stats = self.build()
+        self.assertEqual(2, stats['generated'])
+
+    def test_removedTargetRebuildsLinkingPages(self):
+        write(os.path.join(self.content, 'about.md'), '# About')
+        self.build()
+        os.remove(os.path.join(self.content, 'about.md'))
+        stats = self.build()
+        self.assertEqual(1, stats['generated'])
+        self.assertEqual(1, stats['deleted'])
+
+
+if __name__ == '__main__':
+    unittest.main()
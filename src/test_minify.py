@@ -0,0 +1,26 @@
+import unittest
+
+from minify import HTMLMinifier, iter_minified
+
+
+class TestHTMLMinifier(unittest.TestCase):
+    def test_collapsesWhitespace(self):
+        html = '<p>Some\n   text with <b>bold</b> <i>italic</i></p>'
+        self.assertEqual('<p>Some text with <b>bold</b> <i>italic</i></p>', ''.join(iter_minified([html])))
+
+    def test_betweenTags(self):
+        minifier = HTMLMinifier(between_tags=True)
+        self.assertEqual('<html><head><title> Home </title></head>', minifier.feed('\n<html>\n  <head>\n    <title> Home </title>\n  </head>'))
+
+    def test_preAndCodeAreKept(self):
+        html = '<p>a  b</p><pre><code>x\n\n    y  z</code></pre><p>c   <code>d  e</code></p>'
+        self.assertEqual('<p>a b</p><pre><code>x\n\n    y  z</code></pre><p>c <code>d  e</code></p>', ''.join(iter_minified([html])))
+
+    def test_stateCarriesAcrossChunks(self):
+        chunks = ['<p>a  ', '  b</p><pre>keep  ', '  this</pre> ', ' <p>c</p>']
+        self.assertEqual('<p>a b</p><pre>keep    this</pre> <p>c</p>', ''.join(iter_minified(chunks)))
+        self.assertEqual(''.join(iter_minified([''.join(chunks)])), ''.join(iter_minified(chunks)))
+
+
+if __name__ == '__main__':
+    unittest.main()
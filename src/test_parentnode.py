@@ -1,6 +1,7 @@
+import io
 import unittest
 
-from src.htmlnode import ParentNode, LeafNode
+from htmlnode import ParentNode, LeafNode
 
 
 class TestParentNode(unittest.TestCase):
@@ -96,5 +97,26 @@ class TestParentNode(unittest.TestCase):
         with self.assertRaises(ValueError):
             node.to_html()
 
+    def test_ParentNode_deepNesting(self):
+        node = LeafNode(None, 'deep')
+        for _ in range(5000):
+            node = ParentNode('div', [node])
+        html = node.to_html()
+        self.assertEqual('<div>' * 5000 + 'deep' + '</div>' * 5000, html)
+
+    def test_ParentNode_writeHTML(self):
+        node = ParentNode(
+            'p',
+            [
+                LeafNode('b', 'Bold text'),
+                ParentNode('span', [LeafNode(None, 'Normal text')]),
+                LeafNode('a', 'link', {'href': '/'}),
+            ],
+        )
+        file = io.StringIO()
+        node.write_html(file)
+        self.assertEqual(node.to_html(), file.getvalue())
+        self.assertEqual('<p><b>Bold text</b><span>Normal text</span><a href="/">link</a></p>', file.getvalue())
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,9 +1,15 @@
+import io
+import os
+import tempfile
 import unittest
 from imp import new_module
 
-from src.parse_markdown import split_nodes_delimiter, extract_markdown_images, extract_markdown_links, split_nodes_link, \
-    split_nodes_image, text_to_textnodes, markdown_to_blocks, block_to_block_type, BlockType, extract_title
-from src.textnode import TextNode, TextType
+from parse_markdown import split_nodes_delimiter, extract_markdown_images, extract_markdown_links, split_nodes_link, \
+    split_nodes_image, text_to_textnodes, markdown_to_blocks, block_to_block_type, BlockType, extract_title, \
+    iter_blocks, iter_lines, iter_mapped_lines, iter_markdown_blocks, BLOCK_RULES, register_block_type, \
+    markdown_to_html_node
+from htmlnode import LeafNode
+from textnode import TextNode, TextType
 
 
 class TestSplitNodes(unittest.TestCase):
@@ -226,6 +232,17 @@ class TestSplitNodesImage(unittest.TestCase):
         ]
         self.assertEqual(expected, new_nodes)
 
+    def test_duplicateImages(self):
+        old_nodes = [TextNode('![logo](a.png) and ![logo](a.png) again', TextType.TEXT)]
+        new_nodes = split_nodes_image(old_nodes)
+        expected = [
+            TextNode('logo', TextType.IMAGE, 'a.png'),
+            TextNode(' and ', TextType.TEXT),
+            TextNode('logo', TextType.IMAGE, 'a.png'),
+            TextNode(' again', TextType.TEXT),
+        ]
+        self.assertEqual(expected, new_nodes)
+
 
 class TestSplitNodesLink(unittest.TestCase):
     def test_noLink(self):
@@ -295,6 +312,18 @@ class TestSplitNodesLink(unittest.TestCase):
         ]
         self.assertEqual(expected, new_nodes)
 
+    def test_duplicateLinks(self):
+        old_nodes = [TextNode('[home](/) first, [home](/) second, [home](/)', TextType.TEXT)]
+        new_nodes = split_nodes_link(old_nodes)
+        expected = [
+            TextNode('home', TextType.LINK, '/'),
+            TextNode(' first, ', TextType.TEXT),
+            TextNode('home', TextType.LINK, '/'),
+            TextNode(' second, ', TextType.TEXT),
+            TextNode('home', TextType.LINK, '/'),
+        ]
+        self.assertEqual(expected, new_nodes)
+
 
 class TestTextToTextNodes(unittest.TestCase):
     def test_emptyText(self):
@@ -320,6 +349,27 @@ class TestTextToTextNodes(unittest.TestCase):
         ]
         self.assertEqual(expected, nodes)
 
+    def test_matchesChainedSplits(self):
+        texts = [
+            'plain text only',
+            'a **bold *not italic* inside** b',
+            '*italic `not code` inside* and `code` after',
+            '``empty code`` and ****empty bold****',
+            '[link](a) ![image](b) !not [an *image*](c) [last](d)',
+            '**[link in bold](a)** and `![image in code](b)`',
+        ]
+        for text in texts:
+            nodes = split_nodes_delimiter([TextNode(text, TextType.TEXT)], '**', TextType.BOLD)
+            nodes = split_nodes_delimiter(nodes, '*', TextType.ITALIC)
+            nodes = split_nodes_delimiter(nodes, '`', TextType.CODE)
+            nodes = split_nodes_link(split_nodes_image(nodes))
+            self.assertEqual(nodes, text_to_textnodes(text))
+
+    def test_unbalancedDelimiters(self):
+        for text in ['**bold', '*italic', '`code', '*italic **bold***', '`code *italic` end*']:
+            with self.assertRaises(ValueError):
+                text_to_textnodes(text)
+
 
 class TestMarkdownToBlocks(unittest.TestCase):
     def test_emptyString(self):
@@ -353,6 +403,67 @@ This is a paragraph of text. It has some **bold** and *italic* words inside of i
 
         self.assertEqual(['# This is a heading'], blocks)
 
+    def test_codeBlockWithBlankLines(self):
+        text = """Some text
+
+```
+first line
+
+second line
+```
+
+```inline code```
+
+After code"""
+        blocks = markdown_to_blocks(text)
+        expected = [
+            'Some text',
+            '```\nfirst line\n\nsecond line\n```',
+            '```inline code```',
+            'After code',
+        ]
+        self.assertEqual(expected, blocks)
+
+    def test_blankLinesAndWhitespace(self):
+        text = '\n\n  First\n\n\n   \n\nSecond  \n\n\n'
+        self.assertEqual(['First', 'Second'], markdown_to_blocks(text))
+
+    def test_unterminatedFence(self):
+        text = 'Intro\n\n```\nnot code\n\n# Heading\n\n```python\nText'
+        expected = ['Intro', '```\nnot code', '# Heading', '```python\nText']
+        self.assertEqual(expected, markdown_to_blocks(text))
+
+
+class TestIterMarkdownBlocks(unittest.TestCase):
+    def test_iterLinesAcrossChunks(self):
+        file = io.StringIO('first line\nsecond\n\nthird')
+        self.assertEqual(['first line', 'second', '', 'third'], list(iter_lines(file, chunk_size=3)))
+
+    def test_mappedLinesMatchIterLines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'page.md')
+            for text in ('', '\n', 'one', 'one\n', 'one\r\ntwo\r\n\r\nthree', 'a\n\nb \u00e9\n\n'):
+                with open(path, 'w', newline='') as file:
+                    file.write(text)
+                with open(path) as file:
+                    self.assertEqual(list(iter_lines(file)), list(iter_mapped_lines(path)))
+
+    def test_matchesMarkdownToBlocks(self):
+        text = '# Title\n\nParagraph\nwith two lines\n\n```\ncode\n\n\nmore code\n```\n\n- a\n- b\n'
+        for chunk_size in (1, 2, 7, 1024):
+            blocks = list(iter_markdown_blocks(io.StringIO(text), chunk_size))
+            self.assertEqual(markdown_to_blocks(text), blocks)
+
+    def test_unterminatedFenceMatchesMarkdownToBlocks(self):
+        text = '# Title\n\n```\ncode\n\n\n- a\n- b\n\nlast'
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'page.md')
+            with open(path, 'w') as file:
+                file.write(text)
+            self.assertEqual(markdown_to_blocks(text), list(iter_blocks(iter_mapped_lines(path))))
+        self.assertEqual(markdown_to_blocks(text), list(iter_markdown_blocks(io.StringIO(text), 3)))
+        self.assertEqual(['# Title', '```\ncode', '- a\n- b', 'last'], markdown_to_blocks(text))
+
 
 class TestBlockToBlockType(unittest.TestCase):
     def test_empty(self):
@@ -440,6 +551,34 @@ print('Hello, World!)
         self.assertEqual(BlockType.PARAGRAPH, block_type)
 
 
+class TestRegisterBlockType(unittest.TestCase):
+    def setUp(self):
+        self.saved_rules = {char: list(rules) for char, rules in BLOCK_RULES.items()}
+
+    def tearDown(self):
+        BLOCK_RULES.clear()
+        BLOCK_RULES.update(self.saved_rules)
+
+    def test_newBlockType(self):
+        register_block_type(
+            'rule',
+            '=',
+            lambda block, lines: set(block) == {'='},
+            lambda block: LeafNode('hr', ''))
+        self.assertEqual('rule', block_to_block_type('==='))
+        self.assertEqual(BlockType.PARAGRAPH, block_to_block_type('=== not a rule'))
+        self.assertEqual('<div><p>Text</p><hr></hr></div>', markdown_to_html_node('Text\n\n===').to_html())
+
+    def test_overrideBuiltInRule(self):
+        register_block_type(
+            'admonition',
+            '>',
+            lambda block, lines: lines[0].startswith('> !'),
+            lambda block: LeafNode('aside', block.removeprefix('> !')))
+        self.assertEqual('admonition', block_to_block_type('> !Careful'))
+        self.assertEqual(BlockType.QUOTE, block_to_block_type('> Just a quote'))
+
+
 class TestExtractTitle(unittest.TestCase):
     def test_emptyMarkdown(self):
         with self.assertRaises(ValueError):
@@ -0,0 +1,118 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import profiling
+from handle_files import generate_page_recursive
+from parse_markdown import markdown_to_html_node
+
+
+class TestProfiler(unittest.TestCase):
+    def test_stageTotals(self):
+        profiler = profiling.Profiler()
+        with profiler.stage('read', 10):
+            pass
+        with profiler.stage('read') as timer:
+            timer.bytes = 5
+        self.assertEqual(15, profiler.stages['read'][1])
+        self.assertEqual(2, profiler.stages['read'][2])
+
+    def test_pagesRecordTheirStages(self):
+        profiler = profiling.Profiler()
+        with profiler.page('a.md'):
+            profiler.add('parse', 0.5)
+        profiler.add('parse', 0.25)
+        with profiler.page('b.md'):
+            pass
+        self.assertEqual(0.5, profiler.pages['a.md']['parse'])
+        self.assertEqual(['a.md', 'b.md'], sorted(profiler.pages))
+        self.assertEqual(0.75, profiler.stages['parse'][0])
+
+    def test_nestedStagesKeepTheirSelfTime(self):
+        profiler = profiling.Profiler()
+        with profiler.stage('render'):
+            with profiler.stage('inline'):
+                time.sleep(0.02)
+        render, inline = profiler.stages['render'], profiler.stages['inline']
+        self.assertGreaterEqual(render[0], inline[0])
+        self.assertLess(render[3], 0.01)
+        self.assertAlmostEqual(render[0], render[3] + inline[3], places=6)
+        self.assertIn('all', profiler.summary())
+
+    def test_iterStageTimesTheStream(self):
+        profiler = profiling.Profiler()
+
+        def chunks():
+            with profiler.stage('inline'):
+                time.sleep(0.01)
+            yield 'abc'
+            yield 'de'
+
+        with profiler.stage('write'):
+            parts = list(profiler.iter_stage('render', chunks()))
+        self.assertEqual(['abc', 'de'], parts)
+        self.assertEqual([5, 1], profiler.stages['render'][1:3])
+        self.assertGreaterEqual(profiler.stages['render'][0], profiler.stages['inline'][0])
+        self.assertLess(profiler.stages['write'][3], profiler.stages['inline'][0])
+
+    def test_disabledStagesAreNoOps(self):
+        profiling.disable()
+        with profiling.stage('read') as timer:
+            timer.bytes = 1
+        markdown_to_html_node('# Title')
+        self.assertIsNone(profiling.active_profiler)
+
+    def test_markdownStagesAreRecorded(self):
+        profiler = profiling.enable()
+        try:
+            markdown_to_html_node('# Title\n\nSome *text*')
+        finally:
+            profiling.disable()
+        self.assertEqual({'blocks', 'inline'}, set(profiler.stages))
+
+
+class TestBuildProfile(unittest.TestCase):
+    def test_report(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            content = os.path.join(tmp, 'content')
+            os.makedirs(content)
+            for index in range(3):
+                with open(os.path.join(content, f'page{index}.md'), 'w') as file:
+                    file.write(f'# Page {index}\n\n' + 'Some **tëxt** ' * (index + 1) * 100)
+            template = os.path.join(tmp, 'template.html')
+            with open(template, 'w') as file:
+                file.write('{{ Title }}{{ Content }}')
+
+            profiler = profiling.enable()
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    generate_page_recursive(content, template, os.path.join(tmp, 'public'))
+            finally:
+                profiling.disable()
+
+            report_path = os.path.join(tmp, 'profile.json')
+            profiler.write_json(report_path, top=2)
+            with open(report_path) as file:
+                report = json.load(file)
+
+        self.assertEqual(3, report['pages'])
+        self.assertEqual(
+            {'read', 'blocks', 'inline', 'serialize', 'template', 'write'},
+            set(report['stages']))
+        self.assertEqual(3, report['stages']['write']['calls'])
+        # byte counts, not characters
+        self.assertEqual(sum(len(f'# Page {index}\n\n'.encode()) + 15 * (index + 1) * 100 for index in range(3)),
+                         report['stages']['read']['bytes'])
+        self.assertLessEqual(
+            sum(stage['self_seconds'] for stage in report['stages'].values()),
+            sum(stage['seconds'] for stage in report['stages'].values()))
+        self.assertEqual(2, len(report['slowest_pages']))
+        self.assertIn('slowest 2 of 3 pages', profiler.summary(2))
+
+
+if __name__ == '__main__':
+    unittest.main()
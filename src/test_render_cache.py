@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+from parse_markdown import markdown_to_html_node
+from render_cache import RenderCache
+
+
+class TestRenderCache(unittest.TestCase):
+    def test_getAndPut(self):
+        cache = RenderCache()
+        key = cache.key('block', 'Some *text*')
+        self.assertIsNone(cache.get(key))
+        cache.put(key, '<p>Some <i>text</i></p>')
+        self.assertEqual('<p>Some <i>text</i></p>', cache.get(key))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_keyDependsOnKind(self):
+        self.assertNotEqual(RenderCache.key('block', 'text'), RenderCache.key('page', 'text'))
+
+    def test_evictsLeastRecentlyUsed(self):
+        cache = RenderCache(max_entries=2)
+        cache.put('a', 'A')
+        cache.put('b', 'B')
+        cache.get('a')
+        cache.put('c', 'C')
+        self.assertEqual(['a', 'c'], list(cache.entries))
+
+    def test_evictsBySize(self):
+        cache = RenderCache(max_size=10)
+        cache.put('a', '12345')
+        cache.put('b', '12345')
+        cache.put('c', '123')
+        self.assertEqual(['b', 'c'], list(cache.entries))
+        self.assertEqual(8, cache.size)
+
+    def test_saveAndLoad(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cache.json')
+            cache = RenderCache(path=path)
+            cache.put('a', 'A')
+            cache.put('b', 'B')
+            cache.save()
+            self.assertEqual(['a', 'b'], list(RenderCache(path=path).entries))
+
+
+class TestMarkdownToHTMLNodeWithCache(unittest.TestCase):
+    def test_cachedOutputMatches(self):
+        markdown = '# Title\n\nA **notice**\n\n```\ncode\n```\n\nA **notice**'
+        cache = RenderCache()
+        expected = markdown_to_html_node(markdown).to_html()
+        self.assertEqual(expected, markdown_to_html_node(markdown, cache).to_html())
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(expected, markdown_to_html_node(markdown, cache).to_html())
+        self.assertEqual(5, cache.hits)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+from template import Template, load_template
+
+
+class TestTemplate(unittest.TestCase):
+    def test_compileSegments(self):
+        template = Template('<title>{{ Title }}</title><body>{{Content}}</body>')
+        self.assertEqual(['<title>', '</title><body>', '</body>'], template.literals)
+        self.assertEqual(['Title', 'Content'], template.slots)
+
+    def test_render(self):
+        template = Template('<title> {{ Title }} </title>{{ Content }}')
+        html = template.render({'Title': 'Home', 'Content': '<p>Hi</p>'})
+        self.assertEqual('<title> Home </title><p>Hi</p>', html)
+
+    def test_renderStreamedValue(self):
+        template = Template('<article>{{ Content }}</article>')
+        html = template.render({'Content': iter(['<p>', 'Hi', '</p>'])})
+        self.assertEqual('<article><p>Hi</p></article>', html)
+
+    def test_arbitraryAndRepeatedPlaceholders(self):
+        template = Template('{{ Author }} wrote {{ Title }} ({{ Date }}) - {{ Title }}')
+        html = template.render({'Author': 'Ann', 'Title': 'Post', 'Date': '2024'})
+        self.assertEqual('Ann wrote Post (2024) - Post', html)
+
+    def test_unknownPlaceholderIsKept(self):
+        template = Template('{{ Title }} {{ Missing }}')
+        self.assertEqual('Home {{ Missing }}', template.render({'Title': 'Home'}))
+
+    def test_noPlaceholders(self):
+        template = Template('<p>static</p>')
+        self.assertEqual('<p>static</p>', template.render({'Title': 'unused'}))
+
+
+class TestLoadTemplate(unittest.TestCase):
+    def test_minifiedLiteralsAreCompiledOnce(self):
+        template = Template('<html>\n  <title> {{ Title }} </title>\n  <body>\n    {{ Content }}\n  </body>\n</html>\n', True)
+        self.assertEqual(['<html><title> ', ' </title><body> ', ' </body></html>'], template.literals)
+        html = template.render({'Title': 'Home', 'Content': ['<p>Hello\n  ', '  world</p>', '<pre>a\n  b</pre>']})
+        self.assertEqual('<html><title> Home </title><body> <p>Hello world</p><pre>a\n  b</pre> </body></html>', html)
+
+    def test_minifyKeepsSlotsInsidePre(self):
+        template = Template('<pre>{{ Code }}</pre>\n<p>{{ Text }}</p>', True)
+        self.assertEqual('<pre> a\n  b</pre> <p>c d</p>', template.render({'Code': ' a\n  b', 'Text': 'c\n d'}))
+
+    def test_cachedUntilModified(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'template.html')
+            with open(path, 'w') as file:
+                file.write('{{ Title }}')
+            first = load_template(path)
+            self.assertIs(first, load_template(path))
+
+            with open(path, 'w') as file:
+                file.write('<h1>{{ Title }}</h1>')
+            os.utime(path, ns=(0, 0))
+            second = load_template(path)
+            self.assertIsNot(first, second)
+            self.assertEqual('<h1>Home</h1>', second.render({'Title': 'Home'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
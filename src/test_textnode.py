@@ -1,6 +1,14 @@
 import unittest
+from enum import Enum
 
-from src.textnode import TextNode, TextType, text_node_to_html
+from htmlnode import LeafNode
+from textnode import TextNode, TextType, text_node_to_html, text_node_to_html_string, text_nodes_to_html, \
+    register_inline_renderer, INLINE_RENDERERS
+
+
+class ExtraTextType(Enum):
+    STRIKETHROUGH = 'strikethrough'
+    MENTION = 'mention'
 
 
 class TextTextNode(unittest.TestCase):
@@ -19,6 +27,17 @@ class TextTextNode(unittest.TestCase):
         node2 = TextNode('This is a text node', TextType.ITALIC)
         self.assertNotEqual(node, node2)
 
+    def test_TextNode_storesTextTypeEnum(self):
+        node = TextNode('This is a text node', TextType.CODE)
+        self.assertIs(TextType.CODE, node.text_type)
+        self.assertEqual('TextNode(This is a text node, code, None)', repr(node))
+
+    def test_TextNode_hasNoInstanceDict(self):
+        node = TextNode('This is a text node', TextType.TEXT)
+        self.assertFalse(hasattr(node, '__dict__'))
+        with self.assertRaises(AttributeError):
+            node.extra = 'value'
+
 
 class TestTextNodeToHTML(unittest.TestCase):
     def test_text(self):
@@ -40,5 +59,56 @@ class TestTextNodeToHTML(unittest.TestCase):
         self.assertEqual(html_node.tag, 'b')
         self.assertEqual(html_node.value, 'This is bold')
 
+
+class TestInlineRenderers(unittest.TestCase):
+    def tearDown(self):
+        for text_type in ExtraTextType:
+            INLINE_RENDERERS.pop(text_type, None)
+
+    def test_stringRenderersMatchLeafNodes(self):
+        nodes = [
+            TextNode('plain', TextType.TEXT),
+            TextNode('bold', TextType.BOLD),
+            TextNode('italic', TextType.ITALIC),
+            TextNode('code', TextType.CODE),
+            TextNode('link', TextType.LINK, 'https://www.boot.dev'),
+            TextNode('image', TextType.IMAGE, 'https://www.boot.dev/img.png'),
+        ]
+        for node in nodes:
+            self.assertEqual(text_node_to_html(node).to_html(), text_node_to_html_string(node))
+        self.assertEqual(''.join(text_node_to_html(node).to_html() for node in nodes), text_nodes_to_html(nodes))
+
+    def test_customInlineType(self):
+        register_inline_renderer(
+            ExtraTextType.STRIKETHROUGH,
+            lambda text_node: LeafNode('s', text_node.text))
+        node = TextNode('gone', ExtraTextType.STRIKETHROUGH)
+        self.assertEqual('s', text_node_to_html(node).tag)
+        self.assertEqual('<s>gone</s>', text_node_to_html_string(node))
+
+    def test_customInlineTypeWithFastPath(self):
+        register_inline_renderer(
+            ExtraTextType.MENTION,
+            lambda text_node: LeafNode('a', f'@{text_node.text}', {'href': f'/users/{text_node.text}'}),
+            lambda text_node: f'<a href="/users/{text_node.text}">@{text_node.text}</a>')
+        nodes = [TextNode('hi ', TextType.TEXT), TextNode('ann', ExtraTextType.MENTION)]
+        self.assertEqual('hi <a href="/users/ann">@ann</a>', text_nodes_to_html(nodes))
+
+    def test_replacedTextRenderer(self):
+        text_renderer = INLINE_RENDERERS[TextType.TEXT]
+        self.addCleanup(INLINE_RENDERERS.__setitem__, TextType.TEXT, text_renderer)
+        register_inline_renderer(TextType.TEXT, lambda text_node: LeafNode(None, text_node.text.replace('&', '&amp;')))
+        nodes = [TextNode('a & b ', TextType.TEXT), TextNode('c', TextType.BOLD)]
+        self.assertEqual('a &amp; b <b>c</b>', text_nodes_to_html(nodes))
+        self.assertEqual(''.join(text_node_to_html(node).to_html() for node in nodes), text_nodes_to_html(nodes))
+
+    def test_unknownType(self):
+        node = TextNode('gone', ExtraTextType.STRIKETHROUGH)
+        with self.assertRaises(ValueError):
+            text_node_to_html(node)
+        with self.assertRaises(ValueError):
+            text_nodes_to_html([node])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,119 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import test_support
+from handle_files import generate_page_recursive, move_files
+from test_support import read
+from watch import Inotify, SiteWatcher, TreeScanner
+
+
+def write(path: str, text: str) -> None:
+    test_support.write(path, text)
+    # make sure the change is visible even on filesystems with coarse timestamps
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+class TestSiteWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.static = os.path.join(self.root, 'static')
+        self.content = os.path.join(self.root, 'content')
+        self.template = os.path.join(self.root, 'template.html')
+        self.public = os.path.join(self.root, 'public')
+        write(os.path.join(self.static, 'index.css'), 'body {}')
+        write(os.path.join(self.content, 'index.md'), '# Home\n\nWelcome')
+        write(os.path.join(self.content, 'blog', 'post.md'), '# Post\n\nText')
+        write(self.template, '{{ Title }}|{{ Content }}')
+        move_files(self.static, self.public)
+        generate_page_recursive(self.content, self.template, self.public)
+        self.watcher = SiteWatcher(self.static, self.content, self.template, self.public, use_inotify=False)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_nothingChanged(self):
+        self.assertEqual({'generated': 0, 'copied': 0, 'deleted': 0, 'failed': 0}, self.watcher.poll())
+
+    def test_onlyEditedPageIsRegenerated(self):
+        write(os.path.join(self.content, 'blog', 'post.md'), '# Post\n\nEdited')
+        stats = self.watcher.poll()
+        self.assertEqual(1, stats['generated'])
+        self.assertEqual('Post|<div><h1>Post</h1><p>Edited</p></div>', read(os.path.join(self.public, 'blog', 'post.html')))
+
+    def test_templateChangeRegeneratesAllPages(self):
+        write(self.template, '<h1>{{ Title }}</h1>{{ Content }}')
+        stats = self.watcher.poll()
+        self.assertEqual(2, stats['generated'])
+        self.assertTrue(read(os.path.join(self.public, 'index.html')).startswith('<h1>Home</h1>'))
+
+    def test_assetsAreCopiedAndDeleted(self):
+        write(os.path.join(self.static, 'images', 'logo.svg'), '<svg/>')
+        os.remove(os.path.join(self.static, 'index.css'))
+        stats = self.watcher.poll()
+        self.assertEqual({'generated': 0, 'copied': 1, 'deleted': 1, 'failed': 0}, stats)
+        self.assertEqual('<svg/>', read(os.path.join(self.public, 'images', 'logo.svg')))
+        self.assertFalse(os.path.exists(os.path.join(self.public, 'index.css')))
+
+    def test_brokenPageDoesNotStopWatching(self):
+        write(os.path.join(self.content, 'index.md'), 'no title')
+        self.assertEqual(1, self.watcher.poll()['failed'])
+        write(os.path.join(self.content, 'index.md'), '# Fixed')
+        self.assertEqual(1, self.watcher.poll()['generated'])
+
+    def test_removedDirectoryIsDropped(self):
+        shutil.rmtree(os.path.join(self.content, 'blog'))
+        self.assertEqual(1, self.watcher.poll()['deleted'])
+        self.assertFalse(os.path.exists(os.path.join(self.public, 'blog', 'post.html')))
+
+    def test_onlyDirtyDirectoriesAreRescanned(self):
+        write(os.path.join(self.content, 'index.md'), '# Home\n\nEdited')
+        write(os.path.join(self.content, 'blog', 'post.md'), '# Post\n\nEdited')
+        stats = self.watcher.poll({os.path.join(self.content, 'blog')})
+        self.assertEqual(1, stats['generated'])
+        self.assertIn('Edited', read(os.path.join(self.public, 'blog', 'post.html')))
+        self.assertNotIn('Edited', read(os.path.join(self.public, 'index.html')))
+
+
+class TestTreeScanner(unittest.TestCase):
+    def test_unchangedListingsAreReused(self):
+        with tempfile.TemporaryDirectory() as root:
+            write(os.path.join(root, 'a', 'one.md'), 'one')
+            old = os.stat(os.path.join(root, 'a')).st_mtime_ns - 10_000_000_000
+            os.utime(os.path.join(root, 'a'), ns=(old, old))
+            scanner = TreeScanner(root, 'out')
+            self.assertEqual([os.path.join(root, 'a', 'one.md')], list(scanner.scan()))
+
+            # a file that appears without touching the directory mtime is not listed
+            write(os.path.join(root, 'a', 'two.md'), 'two')
+            os.utime(os.path.join(root, 'a'), ns=(old, old))
+            self.assertEqual([os.path.join(root, 'a', 'one.md')], list(scanner.scan()))
+            self.assertEqual(2, len(scanner.scan({os.path.join(root, 'a')})))
+
+    def test_directoryRemovedWhileScanning(self):
+        with tempfile.TemporaryDirectory() as root:
+            write(os.path.join(root, 'a', 'one.md'), 'one')
+            scanner = TreeScanner(root, 'out', on_new_dir=lambda path: path.endswith('a') and shutil.rmtree(path))
+            self.assertEqual({}, scanner.scan())
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), 'inotify is Linux only')
+class TestInotify(unittest.TestCase):
+    def test_reportsChangedDirectory(self):
+        with tempfile.TemporaryDirectory() as root:
+            inotify = Inotify()
+            try:
+                inotify.watch(root)
+                self.assertEqual(set(), inotify.read(timeout=0))
+                write(os.path.join(root, 'page.md'), 'text')
+                self.assertEqual({root}, inotify.read(timeout=1))
+            finally:
+                inotify.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
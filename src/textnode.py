@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Union
+from typing import Callable, Dict, Hashable, Iterable, NamedTuple, Optional, Union
 
 from htmlnode import LeafNode
 
@@ -13,9 +13,11 @@ class TextType(Enum):
 
 
 class TextNode:
+    __slots__ = ('text', 'text_type', 'url')
+
     def __init__(self, text, text_type: TextType, url = None):
         self.text: str = text
-        self.text_type: str = text_type.value
+        self.text_type: TextType = text_type
         self.url: Union[str|None] = url
 
     def __eq__(self, other):
@@ -28,20 +30,81 @@ class TextNode:
         return False
 
     def __repr__(self) -> str:
-        return f'TextNode({self.text}, {self.text_type}, {self.url})'
+        return f'TextNode({self.text}, {self.text_type.value}, {self.url})'
+
+
+class InlineRenderer(NamedTuple):
+    to_html_node: Callable[[TextNode], LeafNode]
+    to_html: Callable[[TextNode], str]
+
+
+# text type -> renderer; register_inline_renderer adds custom inline types
+INLINE_RENDERERS: Dict[Hashable, InlineRenderer] = {}
+
+
+def register_inline_renderer(
+        text_type: Hashable,
+        to_html_node: Callable[[TextNode], LeafNode],
+        to_html: Optional[Callable[[TextNode], str]] = None
+) -> None:
+    if to_html is None:
+        to_html = lambda text_node: to_html_node(text_node).to_html()
+    INLINE_RENDERERS[text_type] = InlineRenderer(to_html_node, to_html)
 
 
 def text_node_to_html(text_node: TextNode) -> LeafNode:
-    if text_node.text_type == TextType.TEXT.value:
-        return LeafNode(None, text_node.text)
-    if text_node.text_type == TextType.BOLD.value:
-        return LeafNode('b', text_node.text)
-    if text_node.text_type == TextType.ITALIC.value:
-        return LeafNode('i', text_node.text)
-    if text_node.text_type == TextType.CODE.value:
-        return LeafNode('code', text_node.text)
-    if text_node.text_type == TextType.LINK.value:
-        return LeafNode('a', text_node.text, {'href': text_node.url})
-    if text_node.text_type == TextType.IMAGE.value:
-        return LeafNode('img', '', {'src': text_node.url, 'alt': text_node.text})
-    raise ValueError(f'Invalid text type: {text_node.text_type}')
+    renderer = INLINE_RENDERERS.get(text_node.text_type)
+    if renderer is None:
+        raise ValueError(f'Invalid text type: {text_node.text_type}')
+    return renderer.to_html_node(text_node)
+
+
+def text_node_to_html_string(text_node: TextNode) -> str:
+    renderer = INLINE_RENDERERS.get(text_node.text_type)
+    if renderer is None:
+        raise ValueError(f'Invalid text type: {text_node.text_type}')
+    return renderer.to_html(text_node)
+
+
+def text_nodes_to_html(text_nodes: Iterable[TextNode]) -> str:
+    # same markup as joining text_node_to_html(...).to_html(), without building LeafNodes
+    # looked up once per call, so a replaced TEXT renderer is honoured without a lookup per node
+    text_to_html = INLINE_RENDERERS[TextType.TEXT].to_html
+    plain = text_to_html is plain_text_to_html
+    parts = []
+    for text_node in text_nodes:
+        if text_node.text_type is TextType.TEXT:
+            parts.append(text_node.text if plain else text_to_html(text_node))
+        else:
+            parts.append(text_node_to_html_string(text_node))
+    return ''.join(parts)
+
+
+def plain_text_to_html(text_node: TextNode) -> str:
+    return text_node.text
+
+
+register_inline_renderer(
+    TextType.TEXT,
+    lambda text_node: LeafNode(None, text_node.text),
+    plain_text_to_html)
+register_inline_renderer(
+    TextType.BOLD,
+    lambda text_node: LeafNode('b', text_node.text),
+    lambda text_node: f'<b>{text_node.text}</b>')
+register_inline_renderer(
+    TextType.ITALIC,
+    lambda text_node: LeafNode('i', text_node.text),
+    lambda text_node: f'<i>{text_node.text}</i>')
+register_inline_renderer(
+    TextType.CODE,
+    lambda text_node: LeafNode('code', text_node.text),
+    lambda text_node: f'<code>{text_node.text}</code>')
+register_inline_renderer(
+    TextType.LINK,
+    lambda text_node: LeafNode('a', text_node.text, {'href': text_node.url}),
+    lambda text_node: f'<a href="{text_node.url}">{text_node.text}</a>')
+register_inline_renderer(
+    TextType.IMAGE,
+    lambda text_node: LeafNode('img', '', {'src': text_node.url, 'alt': text_node.text}),
+    lambda text_node: f'<img src="{text_node.url}" alt="{text_node.text}"></img>')
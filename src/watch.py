@@ -0,0 +1,291 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from handle_files import copy_file, generate_page, remove_output
+
+# source path -> (destination path, mtime in ns, size)
+Snapshot = Dict[str, Tuple[str, int, int]]
+
+# directory -> (its mtime in ns, subdirectory names, the snapshot of the files directly in it)
+Listing = Tuple[int, List[str], Snapshot]
+
+# a directory listing is only reused once its mtime is this old, because filesystems with
+# coarse timestamps can change a directory twice within the same mtime
+SETTLE_NS = 2_000_000_000
+
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x1000000
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+def changed_files(previous: Snapshot, current: Snapshot) -> Tuple[Dict[str, str], Dict[str, str]]:
+    changed = {
+        source_path: entry[0]
+        for source_path, entry in current.items()
+        if previous.get(source_path) != entry
+    }
+    removed = {
+        source_path: entry[0]
+        for source_path, entry in previous.items()
+        if source_path not in current
+    }
+    return changed, removed
+
+
+class TreeScanner:
+    # Keeps the listing of every directory under source, so a rescan only lists the
+    # directories that changed instead of walking the whole tree again.
+    def __init__(
+            self,
+            source: str,
+            destination: str,
+            rename: Callable[[str], str] = lambda path: path,
+            on_new_dir: Optional[Callable[[str], None]] = None
+    ):
+        self.source = source
+        self.destination = destination
+        self.rename = rename
+        self.on_new_dir = on_new_dir
+        self.dirs: Dict[str, Listing] = {}
+
+    def scan(self, dirty: Optional[Set[str]] = None) -> Snapshot:
+        # Without dirty, every file is stat-ed but only directories whose mtime moved are
+        # listed again. With dirty, only those directories and new ones are looked at.
+        settled = time.time_ns() - SETTLE_NS
+        dirs: Dict[str, Listing] = {}
+        result: Snapshot = {}
+        stack = [(self.source, self.destination)]
+        while stack:
+            dir_path, dest_path = stack.pop()
+            previous = self.dirs.get(dir_path)
+            if previous is not None and dirty is not None and dir_path not in dirty:
+                listing = previous
+            else:
+                try:
+                    listing = self.scan_dir(dir_path, dest_path, previous, settled, relist=dirty is not None)
+                except (FileNotFoundError, NotADirectoryError):
+                    # removed while walking, its parent drops it on the next scan
+                    continue
+            dirs[dir_path] = listing
+
+            _, subdirs, files = listing
+            result.update(files)
+            stack.extend(
+                (os.path.join(dir_path, name), os.path.join(dest_path, name))
+                for name in reversed(subdirs)
+            )
+        self.dirs = dirs
+        return result
+
+    def scan_dir(
+            self,
+            dir_path: str,
+            dest_path: str,
+            previous: Optional[Listing],
+            settled: int,
+            relist: bool = False
+    ) -> Listing:
+        if previous is None and self.on_new_dir is not None:
+            # watch before listing, so nothing written in between goes unnoticed
+            self.on_new_dir(dir_path)
+
+        mtime_ns = os.stat(dir_path).st_mtime_ns
+        if not relist and previous is not None and previous[0] == mtime_ns and mtime_ns < settled:
+            subdirs = previous[1]
+            paths = [(source_path, entry[0]) for source_path, entry in previous[2].items()]
+        else:
+            subdirs, names = [], []
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    else:
+                        names.append(entry.name)
+            subdirs.sort()
+            paths = [
+                (os.path.join(dir_path, name), self.rename(os.path.join(dest_path, name)))
+                for name in sorted(names)
+            ]
+
+        files: Snapshot = {}
+        for source_path, destination_path in paths:
+            try:
+                stat = os.stat(source_path)
+            except FileNotFoundError:
+                continue
+            files[source_path] = (destination_path, stat.st_mtime_ns, stat.st_size)
+        return mtime_ns, subdirs, files
+
+
+class Inotify:
+    # Minimal binding to Linux inotify: reports the watched directories that saw a change.
+    MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.paths: Dict[int, str] = {}
+
+    def watch(self, path: str) -> None:
+        descriptor = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if descriptor < 0:
+            code = ctypes.get_errno()
+            if code == errno.ENOENT:
+                return
+            raise OSError(code, f'cannot watch {path}')
+        self.paths[descriptor] = path
+
+    def read(self, timeout: Optional[float] = None) -> Optional[Set[str]]:
+        # changed directories, or None when the kernel dropped events and everything has to be rescanned
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        dirty: Set[str] = set()
+        overflow = False
+        while True:
+            try:
+                data = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                break
+            position = 0
+            while position < len(data):
+                descriptor, mask, _, length = INOTIFY_EVENT.unpack_from(data, position)
+                position += INOTIFY_EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                path = self.paths.get(descriptor)
+                if path is None:
+                    continue
+                dirty.add(path)
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    dirty.add(os.path.dirname(path))
+                if mask & IN_IGNORED:
+                    del self.paths[descriptor]
+        return None if overflow else dirty
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class SiteWatcher:
+    def __init__(
+            self,
+            static_dir: str,
+            dir_path_content: str,
+            template_path: str,
+            dest_dir_path: str,
+            minify: bool = False,
+            use_inotify: bool = True
+    ):
+        self.static_dir = static_dir
+        self.dir_path_content = dir_path_content
+        self.template_path = template_path
+        self.dest_dir_path = dest_dir_path
+        self.minify = minify
+
+        self.inotify = None
+        if use_inotify:
+            try:
+                self.inotify = Inotify()
+                self.inotify.watch(os.path.dirname(os.path.abspath(template_path)))
+            except (OSError, AttributeError) as error:
+                # not on Linux, or out of watches: fall back to polling
+                print(f'inotify is not available, polling instead: {error}')
+                self.inotify = None
+        on_new_dir = self.inotify.watch if self.inotify is not None else None
+
+        self.asset_scanner = TreeScanner(static_dir, dest_dir_path, on_new_dir=on_new_dir)
+        self.page_scanner = TreeScanner(
+            dir_path_content, dest_dir_path, lambda path: path.replace('.md', '.html'), on_new_dir)
+        self.assets = self.scan_assets()
+        self.pages = self.scan_pages()
+        self.template = self.scan_template()
+
+    def scan_assets(self, dirty: Optional[Set[str]] = None) -> Snapshot:
+        return self.asset_scanner.scan(dirty)
+
+    def scan_pages(self, dirty: Optional[Set[str]] = None) -> Snapshot:
+        return self.page_scanner.scan(dirty)
+
+    def scan_template(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.template_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self, dirty: Optional[Set[str]] = None) -> Dict[str, int]:
+        stats = {'generated': 0, 'copied': 0, 'deleted': 0, 'failed': 0}
+
+        assets = self.scan_assets(dirty)
+        changed, removed = changed_files(self.assets, assets)
+        for source_path, destination_path in changed.items():
+            try:
+                copy_file(source_path, destination_path)
+                stats['copied'] += 1
+            except FileNotFoundError:
+                # removed again since the scan, the next poll sees it gone
+                assets.pop(source_path)
+        for destination_path in removed.values():
+            remove_output(destination_path)
+            stats['deleted'] += 1
+        self.assets = assets
+
+        pages = self.scan_pages(dirty)
+        template = self.scan_template()
+        changed, removed = changed_files(self.pages, pages)
+        if template != self.template:
+            changed = {content_path: entry[0] for content_path, entry in pages.items()}
+        for content_path, destination_path in changed.items():
+            try:
+                generate_page(content_path, self.template_path, destination_path, minify=self.minify)
+                stats['generated'] += 1
+            except Exception as error:
+                # keep watching; the page is retried on its next change
+                print(f'Failed to generate "{content_path}": {error!r}')
+                stats['failed'] += 1
+        for destination_path in removed.values():
+            remove_output(destination_path)
+            stats['deleted'] += 1
+        self.pages = pages
+        self.template = template
+
+        return stats
+
+    def wait(self, interval: float) -> Optional[Set[str]]:
+        if self.inotify is None:
+            time.sleep(interval)
+            return None
+        return self.inotify.read()
+
+    def run(self, interval: float = 0.5) -> None:
+        # with inotify this sleeps until something changes, interval only applies to polling
+        print(f'Watching "{self.dir_path_content}", "{self.static_dir}" and "{self.template_path}"')
+        while True:
+            dirty = self.wait(interval)
+            started = time.perf_counter()
+            stats = self.poll(dirty)
+            if any(stats.values()):
+                elapsed = (time.perf_counter() - started) * 1000
+                print(f'Rebuilt in {elapsed:.1f} ms: ' + ', '.join(f'{count} {name}' for name, count in stats.items()))
@@ -0,0 +1,3 @@
+python3 src/main.py --incremental --watch &
+trap 'kill $!' EXIT
+cd public && python3 -m http.server 8888